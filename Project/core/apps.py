@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+
+        # Optional: warm this process's caches in the background as it boots
+        if getattr(settings, 'WARM_CACHES_ON_STARTUP', False):
+            from .warmup import warm_on_startup
+            warm_on_startup()
@@ -0,0 +1,185 @@
+import gzip
+import mimetypes
+import os
+import re
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static asset pipeline.
+# collectstatic writes content-hashed copies of every file plus .gz (and .br
+# when the brotli package is installed) variants of the text ones next to
+# them. StaticAssetMiddleware then serves STATIC_ROOT itself: hashed files
+# never change, so they are cached for a year, and each client gets the
+# smallest variant its Accept-Encoding allows. Files go out as FileResponse,
+# which WSGI servers hand to sendfile through wsgi.file_wrapper.
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+# Smaller files gain nothing from compression
+MIN_COMPRESS_SIZE = 256
+# Variants in order of preference, with the extension collectstatic gives them
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+COMPRESSORS = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+if brotli is not None:
+    COMPRESSORS['br'] = brotli.compress
+
+# Type of a compressed file requested by its own name, when no encoding was negotiated
+COMPRESSED_CONTENT_TYPES = {'gzip': 'application/gzip'}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names can change in place, so clients revalidate them
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+# The part ManifestStaticFilesStorage inserts into a hashed name
+HASHED_NAME = re.compile(r'^(?P<base>.+)\.[0-9a-f]{12}(?P<ext>\.[^./]+)$')
+
+
+def compress(path):
+    # Write the compressed variants of a file; returns the encodings written
+    with open(path, 'rb') as f:
+        content = f.read()
+    written = []
+    for encoding, extension in ENCODINGS:
+        compressor = COMPRESSORS.get(encoding)
+        if compressor is None:
+            continue
+        compressed = compressor(content)
+        # Not worth a variant unless it saves a few percent
+        if len(compressed) < len(content) * 0.95:
+            with open(path + extension, 'wb') as f:
+                f.write(compressed)
+            written.append(encoding)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Manifest storage that also writes compressed variants
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+                continue
+            if self.size(name) >= MIN_COMPRESS_SIZE:
+                compress(self.path(name))
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            # Not collected yet (tests, fresh checkouts); use the plain name
+            return FileSystemStorage.url(self, name)
+
+
+def accepted_encodings(header):
+    # Content codings the client accepts, from an Accept-Encoding header
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def is_hashed(name):
+    # Whether `name` is the fingerprinted copy of a file in the manifest
+    match = HASHED_NAME.match(name)
+    if not match:
+        return False
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return hashed_files.get(match['base'] + match['ext']) == name
+
+
+class StaticAssetMiddleware:
+    # Put first in MIDDLEWARE so asset requests skip sessions and auth
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        url = urlsplit(settings.STATIC_URL or '')
+        if not settings.STATIC_ROOT or url.netloc:
+            # Nothing local to serve, or assets live on another host
+            raise MiddlewareNotUsed
+        self.prefix = url.path if url.path.startswith('/') else '/' + url.path
+        self.root = str(settings.STATIC_ROOT)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Serving is a stat() and an open(); cheap enough to do inline
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        # A response for a file in STATIC_ROOT, or None to pass the request on
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not name or not os.path.isfile(path):
+            return None
+
+        cache_control = IMMUTABLE_CACHE_CONTROL if is_hashed(name) else REVALIDATE_CACHE_CONTROL
+        return file_response(request, path, cache_control)
+
+
+def file_response(request, path, cache_control):
+    # Serve a file, or the best precompressed variant of it, honouring If-Modified-Since
+    stat = os.stat(path)
+    compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        served, encoding = path, None
+        if compressible:
+            accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for coding, extension in ENCODINGS:
+                if coding in accepted and os.path.isfile(path + extension):
+                    served, encoding = path + extension, coding
+                    break
+        content_type, file_encoding = mimetypes.guess_type(path)
+        if file_encoding:
+            # e.g. site.css.gz itself: without a Content-Encoding the client
+            # must not take it for the CSS inside
+            content_type = COMPRESSED_CONTENT_TYPES.get(file_encoding, 'application/octet-stream')
+        response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.headers['Cache-Control'] = cache_control
+    if compressible:
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
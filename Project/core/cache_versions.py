@@ -0,0 +1,64 @@
+import uuid
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Versioned invalidation through the shared cache backend.
+# Each key holds a random token; bumping replaces the token, so every worker
+# process that compares its local token with the cached one sees the change.
+# An evicted key gets a fresh token, which never matches a stale local copy.
+#
+# A process-local backend cannot carry a bump to other workers, so with one
+# no versions are returned at all and every caller falls back to the
+# database, exactly as when the cache is down.
+
+# Backends whose contents other processes cannot see
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared():
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_BACKENDS)
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+def get_versions(keys):
+    # Return {key: token} for all keys, creating tokens for missing ones
+    keys = list(keys)
+    if not keys or not is_shared():
+        return {}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, _new_token(), timeout=None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+async def aget_versions(keys):
+    # get_versions() for async code, through the cache's async API
+    keys = list(keys)
+    if not keys or not is_shared():
+        return {}
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        await cache.aadd(key, _new_token(), timeout=None)
+    if missing:
+        versions.update(await cache.aget_many(missing))
+    return versions
+
+
+def get_version(key):
+    return get_versions([key]).get(key)
+
+
+def bump(keys):
+    # Replace the token for every key so cached copies become stale
+    keys = list(keys)
+    if keys:
+        cache.set_many({key: _new_token() for key in keys}, timeout=None)
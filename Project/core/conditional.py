@@ -0,0 +1,125 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from inventory.models import Category, Item, Maintenance
+from reservations import availability
+from reservations.models import Reservation
+from . import roles
+
+# Conditional GET for the item listings.
+# A page's validators come from two aggregate queries, Max('updated_at') and
+# Count over the items it can show and over the category menu, plus whatever
+# else the rendered page depends on: the query string, the user, the session
+# cart, the CSRF secret, the date and, for the catalog's date filter, the
+# bookings and maintenance in that period. When nothing changed the view returns
+# 304 without running its own queries or rendering a template.
+#
+# Writes that bypass save() (QuerySet.update, bulk_update) must set
+# updated_at themselves for this to see them.
+
+STATE = {'modified': Max('updated_at'), 'count': Count('id')}
+
+
+def item_scope(params):
+    # The items a listing filtered by these GET parameters can show
+    items = Item.objects.all()
+    category_id = params.get('category')
+    if category_id and category_id.isdigit():
+        items = items.filter(category_id=category_id)
+    return items
+
+
+def blocking_state(start, end):
+    # Validators for the bookings and maintenance that block items during
+    # [start, end]; every status change sets updated_at
+    reserved = Reservation.objects.filter(
+        status__in=availability.BLOCKING_RESERVATION_STATUSES,
+        start_date__lte=end,
+        end_date__gte=start
+    ).aggregate(**STATE)
+    maintenance = Maintenance.objects.filter(
+        status__in=availability.BLOCKING_MAINTENANCE_STATUSES,
+        maintenance_date__range=(start, end)
+    ).aggregate(**STATE)
+    return reserved['modified'], reserved['count'], maintenance['modified'], maintenance['count']
+
+
+def _etag(*parts):
+    return quote_etag(hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()[:32])
+
+
+def _latest(*states):
+    modified = [state['modified'] for state in states if state['modified'] is not None]
+    return max(modified) if modified else None
+
+
+def page_validators(request, items, *extra):
+    # (etag, last_modified) for an HTML page listing `items` under the category
+    # menu, or (None, None) when the page has to be rendered anyway
+    if len(get_messages(request)):
+        # Queued messages are shown once; a 304 would swallow them
+        return None, None
+    item_state = items.aggregate(**STATE)
+    category_state = Category.objects.aggregate(**STATE)
+    user = request.user
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    etag = _etag(
+        item_state['modified'], item_state['count'],
+        category_state['modified'], category_state['count'],
+        request.META.get('QUERY_STRING', ''),
+        user.pk, user.get_username(), roles.get_role(user),
+        hashlib.sha256(csrf_cookie.encode()).hexdigest(),
+        timezone.localdate(),
+        *extra
+    )
+    # Signed-in pages carry per-user state that no timestamp covers, so they
+    # are only validated by ETag
+    last_modified = None if user.is_authenticated else _latest(item_state, category_state)
+    return etag, last_modified
+
+
+def conditional_page(validators):
+    # Decorate a view with validators(request, *args, **kwargs) -> (etag, last_modified)
+    def cached(request, *args, **kwargs):
+        # condition() asks for the ETag and Last-Modified separately
+        if not hasattr(request, '_validators'):
+            request._validators = validators(request, *args, **kwargs)
+        return request._validators
+
+    def decorator(view):
+        view = condition(
+            etag_func=lambda request, *args, **kwargs: cached(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: cached(request, *args, **kwargs)[1]
+        )(view)
+        # Make browsers revalidate rather than reuse the page heuristically
+        return cache_control(private=True, no_cache=True)(view)
+    return decorator
+
+
+async def alisting_validators(request, items):
+    # (etag, last_modified) for a JSON listing of `items`
+    state = await items.aaggregate(**STATE)
+    return _etag(state['modified'], state['count'], request.META.get('QUERY_STRING', '')), state['modified']
+
+
+def not_modified(request, etag, last_modified):
+    # A 304 response when the client's copy is current, else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return add_validators(response, etag, last_modified) if response is not None else None
+
+
+def add_validators(response, etag, last_modified):
+    response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    return response
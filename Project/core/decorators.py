@@ -1,22 +1,33 @@
 from django.contrib.auth.decorators import user_passes_test
+from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.http import HttpResponseForbidden
 from functools import wraps
 
+from . import roles
+
+# Role checks read the role RoleMiddleware resolved for the request (see core.roles)
+
 def manager_required(view_func):
-    def check_manager(user):
-        return user.is_authenticated and user.userprofile.role in ['manager', 'admin']
-    return user_passes_test(check_manager)(view_func)
+    return user_passes_test(roles.is_manager)(view_func)
 
 def staff_required(view_func):
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.userprofile.role in ['staff', 'manager', 'admin']:
+        if roles.is_staff_or_manager(request.user):
             return view_func(request, *args, **kwargs)
         return HttpResponseForbidden("Access denied")
     return _wrapped_view
 
+def staff_or_manager_required(view_func):
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not roles.is_staff_or_manager(request.user):
+            raise PermissionDenied
+        return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
 def customer_required(view_func):
     def check_customer(user):
-        return user.is_authenticated and user.userprofile.role == 'customer'
-    return user_passes_test(check_customer)(view_func) 
\ No newline at end of file
+        return roles.get_role(user) == roles.CUSTOMER
+    return user_passes_test(check_customer)(view_func)
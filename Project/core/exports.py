@@ -0,0 +1,139 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from inventory.models import Item, Maintenance
+from reservations.models import Reservation, ReservationItem
+
+# Streaming exports.
+# Every dataset is one values_list() query with its joins done in SQL, read
+# through .iterator() a chunk at a time and encoded line by line, so memory
+# stays flat whatever the number of rows.
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Dataset:
+
+    def __init__(self, model, columns, date_field, status_field=None, status_choices=()):
+        self.model = model
+        # (header, lookup) pairs
+        self.columns = columns
+        self.date_field = date_field
+        self.status_field = status_field
+        self.statuses = {value for value, _ in status_choices}
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+
+DATASETS = {
+    'reservations': Dataset(Reservation, [
+        ('id', 'id'),
+        ('user_email', 'user__email'),
+        ('status', 'status'),
+        ('start_date', 'start_date'),
+        ('end_date', 'end_date'),
+        ('total_cost', 'total_cost'),
+        ('created_at', 'created_at'),
+        ('completed_at', 'completed_at'),
+    ], date_field='start_date', status_field='status', status_choices=Reservation.STATUS_CHOICES),
+    'reservation_items': Dataset(ReservationItem, [
+        ('id', 'id'),
+        ('reservation_id', 'reservation_id'),
+        ('user_email', 'reservation__user__email'),
+        ('status', 'reservation__status'),
+        ('start_date', 'reservation__start_date'),
+        ('end_date', 'reservation__end_date'),
+        ('item_id', 'item_id'),
+        ('item_name', 'item__name'),
+        ('quantity', 'quantity'),
+        ('price_per_day', 'price_per_day'),
+        ('subtotal', 'subtotal'),
+    ], date_field='reservation__start_date', status_field='reservation__status',
+        status_choices=Reservation.STATUS_CHOICES),
+    'items': Dataset(Item, [
+        ('id', 'id'),
+        ('name', 'name'),
+        ('category', 'category__name'),
+        ('daily_rate', 'daily_rate'),
+        ('condition', 'condition'),
+        ('is_available', 'is_available'),
+        ('created_at', 'created_at'),
+    ], date_field='created_at'),
+    'maintenance': Dataset(Maintenance, [
+        ('id', 'id'),
+        ('item_id', 'item_id'),
+        ('item_name', 'item__name'),
+        ('staff_email', 'staff__email'),
+        ('maintenance_date', 'maintenance_date'),
+        ('status', 'status'),
+        ('description', 'description'),
+    ], date_field='maintenance_date', status_field='status',
+        status_choices=Maintenance._meta.get_field('status').choices),
+}
+
+
+def parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ExportError(f'{name} must be a date in YYYY-MM-DD format.')
+
+
+def export_rows(name, start=None, end=None, status=None):
+    # Return (headers, row iterator) for a dataset; dates are inclusive days
+    dataset = DATASETS.get(name)
+    if dataset is None:
+        raise ExportError(f"Unknown dataset. Choose one of: {', '.join(DATASETS)}.")
+    queryset = dataset.model._default_manager.all()
+    if status:
+        if status not in dataset.statuses:
+            raise ExportError(f'Invalid status for {name}.')
+        queryset = queryset.filter(**{dataset.status_field: status})
+    # Plain range bounds rather than __date, so the date column's index is usable
+    if start:
+        queryset = queryset.filter(**{
+            f'{dataset.date_field}__gte': timezone.make_aware(datetime.combine(start, time.min))
+        })
+    if end:
+        queryset = queryset.filter(**{
+            f'{dataset.date_field}__lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        })
+    rows = queryset.order_by('id').values_list(*[lookup for _, lookup in dataset.columns])
+    return dataset.headers, rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    # File-like object whose write() hands the encoded line back to the caller
+    def write(self, value):
+        return value
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode(headers, rows, file_format):
+    # Yield the export one line at a time
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), default=_json_value) + '\n'
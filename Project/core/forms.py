@@ -1,6 +1,8 @@
 from django import forms
 from django.utils import timezone
+from inventory.importer import FORMATS
 from inventory.models import Maintenance, Item
+from . import reference_cache
 
 class MaintenanceForm(forms.ModelForm):
     # Form for scheduling maintenance
@@ -11,6 +13,14 @@ class MaintenanceForm(forms.ModelForm):
         widget=forms.Select(attrs={'class': 'form-control'})
     )
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Render the picker from the reference cache; the queryset still validates
+        item = self.fields['item']
+        item.choices = [('', item.empty_label)] + [
+            (choice['id'], choice['name']) for choice in reference_cache.get('maintenance_items')
+        ]
+
     class Meta:
         model = Maintenance
         fields = ['item', 'maintenance_date', 'description']
@@ -49,4 +59,16 @@ class ReservationForm(forms.Form):
             if start_date < timezone.now():
                 raise forms.ValidationError("Start date cannot be in the past")
             if end_date <= start_date:
-                raise forms.ValidationError("End date must be after start date") 
\ No newline at end of file
+                raise forms.ValidationError("End date must be after start date")
+
+class InventoryImportForm(forms.Form):
+    # Upload for the bulk inventory import
+    file = forms.FileField(
+        help_text='CSV with a header row, or JSON Lines. Columns: id (to update), name, category, description, daily_rate, condition, is_available.',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'})
+    )
+    file_format = forms.ChoiceField(
+        choices=[('', 'Detect from file name')] + [(value, value.upper()) for value in FORMATS],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
@@ -0,0 +1,51 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+# Renders the catalog the way a browser would fetch it, through the full
+# middleware stack, and reports the page size and server-side time. The
+# reservation UI is only rendered for signed-in users, so that is measured
+# as well as the anonymous page. Signing in stores a session, so point this
+# at a scratch database.
+
+
+class Command(BaseCommand):
+    help = 'Measure the size and render time of the catalog page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/catalog/', help='Path and query string to request')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per measurement')
+        parser.add_argument('--username', help='User to sign in as; defaults to the first active user')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive.')
+        User = get_user_model()
+        users = User.objects.filter(is_active=True).order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No matching active user to sign in as.')
+
+        anonymous = Client(HTTP_HOST='localhost')
+        signed_in = Client(HTTP_HOST='localhost')
+        signed_in.force_login(user)
+        for name, client in (('anonymous', anonymous), (f'signed in as {user.get_username()}', signed_in)):
+            # The first request settles the session and warms the caches
+            client.get(options['path'])
+            timings = []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                response = client.get(options['path'])
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{options["path"]} returned {response.status_code}.')
+            self.stdout.write(
+                f'{name}: {len(response.content) / 1024:.1f} KB, '
+                f'p50 {statistics.median(timings) * 1000:.1f} ms, '
+                f'mean {statistics.mean(timings) * 1000:.1f} ms'
+            )
@@ -0,0 +1,122 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+# Compares the same GET under the WSGI handler, driven from a thread pool,
+# and the ASGI handler, driven from one event loop. No server is involved,
+# so the numbers show handler and view cost only.
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def wsgi_environ(path, query):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+    }
+
+
+def asgi_scope(path, query):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark a GET endpoint under the WSGI and the ASGI request handlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/items/', help='Path and query string to request')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per handler')
+        parser.add_argument('--concurrency', type=int, default=10, help='Requests in flight at once')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+        url = urlsplit(options['path'])
+        path, query = url.path or '/', url.query
+
+        for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+            started = time.perf_counter()
+            timings, statuses = run(path, query, options['requests'], options['concurrency'])
+            elapsed = time.perf_counter() - started
+            timings.sort()
+            errors = sum(1 for status in statuses if status >= 400)
+            self.stdout.write(
+                f'{name}: {len(timings) / elapsed:.1f} req/s, '
+                f'p50 {percentile(timings, 0.5) * 1000:.1f} ms, '
+                f'p95 {percentile(timings, 0.95) * 1000:.1f} ms, '
+                f'mean {statistics.mean(timings) * 1000:.1f} ms'
+                + (f', {errors} error responses' if errors else '')
+            )
+
+    def run_wsgi(self, path, query, total, concurrency):
+        handler = WSGIHandler()
+
+        def one(_):
+            status = []
+            started = time.perf_counter()
+            body = handler(wsgi_environ(path, query), lambda code, headers: status.append(code))
+            b''.join(body)
+            if hasattr(body, 'close'):
+                body.close()
+            return time.perf_counter() - started, int(status[0].split()[0])
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        return [timing for timing, _ in results], [status for _, status in results]
+
+    def run_asgi(self, path, query, total, concurrency):
+        handler = ASGIHandler()
+
+        async def one(limit):
+            async with limit:
+                messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+                status = []
+
+                async def receive():
+                    if messages:
+                        return messages.pop()
+                    # Nothing more to send; wait like an idle client would
+                    await asyncio.Future()
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+
+                started = time.perf_counter()
+                await handler(asgi_scope(path, query), receive, send)
+                return time.perf_counter() - started, status[0]
+
+        async def run_all():
+            limit = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*[one(limit) for _ in range(total)])
+
+        results = asyncio.run(run_all())
+        return [timing for timing, _ in results], [status for _, status in results]
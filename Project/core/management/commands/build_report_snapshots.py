@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import reports
+
+
+class Command(BaseCommand):
+    help = 'Incrementally rebuild the daily per-category report snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Recompute every day from this date (YYYY-MM-DD) instead of only touched days'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every day that has data'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['full']:
+            days = reports.touched_days(None, today)
+        elif options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format.')
+            days = list(reports.days_between(since, today))
+        else:
+            days = reports.touched_days(reports.last_computed_at(), today)
+
+        rows = reports.build_snapshots(days)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} snapshot rows covering {len(days)} days.'
+        ))
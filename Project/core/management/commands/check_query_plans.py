@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.query_plans import full_scans, hot_queries
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot view queries and fail if any of them scans a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full plan of every query'
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset in hot_queries():
+            plan = queryset.explain()
+            scanned = full_scans(plan)
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scanned)}"))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbose_plans'] or scanned:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a full table scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream reservations, reserved items, inventory or maintenance history as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(exports.DATASETS))
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--start', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--status', help='Only rows with this status')
+        parser.add_argument('--output', help='Write to this file instead of standard output')
+
+    def handle(self, *args, **options):
+        try:
+            headers, rows = exports.export_rows(
+                options['dataset'],
+                start=exports.parse_date(options['start'], '--start'),
+                end=exports.parse_date(options['end'], '--end'),
+                status=options['status']
+            )
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        lines = exports.encode(headers, rows, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import cache_versions, reference_cache, warmup
+from reservations import availability
+
+
+class Command(BaseCommand):
+    help = ('Precompute the category, availability and report caches and read the catalog pages '
+            'into the database cache after a deploy. Needs a cache backend shared with the workers.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            choices=warmup.TASKS,
+            help='Warm only these tasks (default: all of them)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=availability.CALENDAR_DAYS,
+            help='Length of the availability calendars to precompute'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=warmup.WORKERS,
+            help='Size of the thread pool'
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options['days'] <= availability.CALENDAR_MAX_DAYS:
+            raise CommandError(f'--days must be between 1 and {availability.CALENDAR_MAX_DAYS}.')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive.')
+
+        tasks = options['only'] or warmup.TASKS
+        local = [task for task in tasks if task in warmup.CACHE_TASKS]
+        if local and not cache_versions.is_shared():
+            raise CommandError(
+                f"The cache backend is local to this process, so warming {', '.join(local)} would be lost "
+                'when the command exits. Configure a shared cache, or run with --only catalog reports.'
+            )
+
+        results, total = warmup.warm(tasks, options['days'], options['workers'])
+        lines = warmup.summary(results, total)
+        for line in lines[:-1]:
+            self.stdout.write(line)
+        stats = reference_cache.reference_cache.stats()
+        self.stdout.write(f"Reference cache: {stats['misses']} loaded, {stats['shared_hits']} already shared")
+        failed = [name for name, _, seconds in results if seconds is None]
+        if failed:
+            raise CommandError(f"{lines[-1]}: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS(lines[-1]))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_reservation'),
+        ('inventory', '0006_item_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_items', models.PositiveIntegerField(default=0)),
+                ('available_items', models.PositiveIntegerField(blank=True, null=True)),
+                ('in_use', models.PositiveIntegerField(default=0)),
+                ('in_maintenance', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('reservations_started', models.PositiveIntegerField(default=0)),
+                ('reservations_ended', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.category')),
+            ],
+            options={
+                'ordering': ['day', 'category'],
+                'unique_together': {('day', 'category')},
+            },
+        ),
+    ]
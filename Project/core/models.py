@@ -2,7 +2,8 @@ from django.db import models
 from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from inventory.models import Item, Maintenance  # Import Item and Maintenance
+from django.utils import timezone
+from inventory.models import Category, Item, Maintenance  # Import Item and Maintenance
 
 # Create your models here.
 
@@ -68,3 +69,24 @@ class Reservation(models.Model):
             # Calculate total cost
             self.total_cost = self.item.daily_rate * days
         super().save(*args, **kwargs)
+
+class DailyCategorySnapshot(models.Model):
+    # Per-day, per-category rollup that the reports read instead of raw rows
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='snapshots')
+    total_items = models.PositiveIntegerField(default=0)
+    # Availability flags have no history, so only days computed "live" record them
+    available_items = models.PositiveIntegerField(null=True, blank=True)
+    in_use = models.PositiveIntegerField(default=0)
+    in_maintenance = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reservations_started = models.PositiveIntegerField(default=0)
+    reservations_ended = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.category.name} on {self.day}"
+
+    class Meta:
+        unique_together = ['day', 'category']
+        ordering = ['day', 'category']
@@ -0,0 +1,80 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+# Keyset (cursor) pagination.
+# A cursor encodes the ordering values of the last row on a page, so the next
+# page is a plain indexed range query instead of an ever growing OFFSET, and
+# rows inserted or deleted elsewhere never shift what the cursor points at.
+
+PAGE_SIZE = 24
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    # Return the decoded values, or None for a missing or tampered cursor
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+def _after(fields, values):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y)
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__gt': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return condition
+
+
+def _keyset_queryset(queryset, cursor, fields, size):
+    queryset = queryset.order_by(*fields)
+    values = decode_cursor(cursor, len(fields))
+    if values is not None:
+        queryset = queryset.filter(_after(fields, values))
+    return queryset[:size + 1]
+
+
+def _split_page(rows, fields, size):
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field) for field in fields])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, cursor=None, fields=('name', 'id'), size=PAGE_SIZE):
+    # Return (rows, next_cursor); next_cursor is None on the last page.
+    # `fields` must be unique together so the order is total and stable.
+    rows = list(_keyset_queryset(queryset, cursor, fields, size))
+    return _split_page(rows, fields, size)
+
+
+async def akeyset_page(queryset, cursor=None, fields=('name', 'id'), size=PAGE_SIZE):
+    # keyset_page() for async views
+    rows = [row async for row in _keyset_queryset(queryset, cursor, fields, size)]
+    return _split_page(rows, fields, size)
+
+
+class KnownCountPaginator(Paginator):
+    # Offset paginator that takes its total from a summary query the view already ran,
+    # instead of issuing its own COUNT(*)
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
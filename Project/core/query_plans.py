@@ -0,0 +1,87 @@
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from inventory.models import Category, Item, Maintenance
+from reservations import availability
+from reservations.models import Reservation, ReservationItem
+from .pagination import PAGE_SIZE
+from .views import MAINTENANCE_PER_PAGE, card_items, maintenance_schedule
+
+# The hot queries behind core/views.py, built by the same helpers the views
+# use where there is one, so check_query_plans can EXPLAIN each one and
+# catch a missing index.
+
+# Full table scans in EXPLAIN output; virtual tables are fine
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!\s+(?:USING|VIRTUAL))\s*$', re.MULTILINE),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+# An index scan is only cheap when it also yields the requested order, so
+# it can stop at the LIMIT; followed by a sort it reads the whole index
+INDEX_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+) USING (?:COVERING )?INDEX\b'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'\bUSE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY\b'),
+}
+
+# Tables that are small by design and fine to scan
+SCAN_ALLOWED_TABLES = {Category._meta.db_table}
+
+
+def hot_queries():
+    # Return [(name, queryset)] with placeholder parameters
+    now = timezone.now()
+    later = now + timedelta(days=7)
+    item_ids = [1, 2, 3]
+    items = card_items(Item.objects.all())
+    return [
+        ('catalog page', items.order_by('name', 'id')[:PAGE_SIZE + 1]),
+        ('catalog page in category', items.filter(category_id=1).order_by('name', 'id')[:PAGE_SIZE + 1]),
+        ('home page', card_items(Item.objects.filter(is_available=True)).order_by('name', 'id')[:PAGE_SIZE]),
+        ('catalog page free in period', items.filter(
+            availability.free_during(now, later), category_id=1
+        ).order_by('name', 'id')[:PAGE_SIZE + 1]),
+        ('reserved items in period', ReservationItem.objects.filter(
+            item_id__in=item_ids,
+            reservation__start_date__lte=later,
+            reservation__end_date__gte=now,
+            reservation__status__in=availability.BLOCKING_RESERVATION_STATUSES
+        ).values_list('item_id', flat=True)),
+        ('maintenance in period', Maintenance.objects.filter(
+            item_id__in=item_ids,
+            maintenance_date__range=(now, later),
+            status__in=availability.BLOCKING_MAINTENANCE_STATUSES
+        ).order_by().values_list('item_id', flat=True)),
+        ('blocking reservations in period', Reservation.objects.filter(
+            status__in=availability.BLOCKING_RESERVATION_STATUSES,
+            start_date__lte=later,
+            end_date__gte=now
+        ).order_by().values_list('id', flat=True)),
+        ('my reservations', Reservation.objects.filter(user_id=1).order_by('-created_at', '-id')[:10]),
+        ('returns desk', Reservation.objects.filter(status='overdue').values_list('id', flat=True)),
+        ('lifecycle activation', Reservation.objects.filter(
+            status='confirmed', start_date__lte=now
+        ).order_by('id').values_list('id', flat=True)[:500]),
+        ('maintenance schedule', maintenance_schedule({})[:MAINTENANCE_PER_PAGE]),
+        ('maintenance schedule by status', maintenance_schedule({'status': 'SCHEDULED'})[:MAINTENANCE_PER_PAGE]),
+        ('category stats', Category.objects.annotate(
+            available=Count('items', filter=Q(items__is_available=True))
+        ).order_by('name')),
+    ]
+
+
+def full_scans(plan, vendor=None):
+    # Return the tables an EXPLAIN plan reads in full
+    vendor = vendor or connection.vendor
+    pattern = FULL_SCAN_PATTERNS.get(vendor)
+    if pattern is None:
+        return []
+    tables = pattern.findall(plan)
+    if vendor in SORT_PATTERNS and SORT_PATTERNS[vendor].search(plan):
+        tables += INDEX_SCAN_PATTERNS[vendor].findall(plan)
+    return [table for table in tables if table not in SCAN_ALLOWED_TABLES]
@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Substr
+
+from inventory.models import Category, Item
+from .cache_versions import bump, get_versions
+
+# Reference data read on most pages (category menus, item pickers).
+# Two tiers: a per-process LRU in front of the shared Django cache. Every
+# dataset depends on one or more tables, each with a version token in the
+# shared cache; the Category/Item signals (core.signals) bump the token, so
+# a change made by any worker reaches every other worker's copies. Writes
+# that skip signals (QuerySet.update, bulk_create) must call invalidate().
+#
+# Values are lists of dicts shared between requests; treat them as read-only.
+
+CATEGORY = 'category'
+ITEM = 'item'
+
+# Enough of the description for the twenty words a maintenance item card shows
+CARD_DESCRIPTION_LENGTH = 300
+
+# name: (loader, tables it depends on)
+DATASETS = {
+    'categories': (
+        lambda: list(Category.objects.order_by('name', 'id').values('id', 'name')),
+        (CATEGORY,)
+    ),
+    'category_summaries': (
+        lambda: list(Category.objects.order_by('name', 'id').annotate(
+            item_count=Count('items')
+        ).values('id', 'name', 'description', 'item_count')),
+        (CATEGORY, ITEM)
+    ),
+    'item_names': (
+        lambda: list(Item.objects.order_by('name', 'id').values('id', 'name')),
+        (ITEM,)
+    ),
+    'maintenance_items': (
+        lambda: list(Item.objects.filter(is_available=True).order_by('name', 'id').values('id', 'name')),
+        (ITEM,)
+    ),
+    'maintenance_item_cards': (
+        lambda: list(Item.objects.filter(is_available=True).order_by('name', 'id').annotate(
+            description_start=Substr('description', 1, CARD_DESCRIPTION_LENGTH)
+        ).values('id', 'name', 'description_start')),
+        (ITEM,)
+    ),
+}
+
+
+def version_key(table):
+    return f'reference:{table}'
+
+
+def cache_key(name, versions):
+    return f"reference:data:{name}:{':'.join(versions)}"
+
+
+class ReferenceCache:
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def _limit(self):
+        if self.max_entries is None:
+            return getattr(settings, 'REFERENCE_CACHE_MAX_ENTRIES', 64)
+        return self.max_entries
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get(self, name):
+        loader, tables = DATASETS[name]
+        versions = get_versions(version_key(table) for table in tables)
+        if len(versions) != len(tables):
+            # The shared cache cannot hold versions, so nothing can be trusted
+            self._count('misses')
+            return loader()
+        version = tuple(versions[version_key(table)] for table in tables)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(name)
+                self._stats['local_hits'] += 1
+                return entry[1]
+
+        key = cache_key(name, version)
+        value = cache.get(key)
+        if value is not None:
+            self._count('shared_hits')
+        else:
+            self._count('misses')
+            value = loader()
+            # Rows read inside a transaction may still be rolled back
+            if transaction.get_connection().in_atomic_block:
+                return value
+            cache.set(key, value, timeout=getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 60 * 60 * 24))
+        self._store(name, version, value)
+        return value
+
+    def _store(self, name, version, value):
+        with self._lock:
+            self._entries[name] = (version, value)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self._limit():
+                self._entries.popitem(last=False)
+
+    def warm(self, names=None):
+        # Load datasets ahead of the first request; returns the names loaded
+        names = list(names or DATASETS)
+        for name in names:
+            self.get(name)
+        return names
+
+    def discard(self, tables):
+        tables = set(tables)
+        with self._lock:
+            for name in [name for name in self._entries if tables & set(DATASETS[name][1])]:
+                del self._entries[name]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+
+reference_cache = ReferenceCache()
+
+
+def get(name):
+    return reference_cache.get(name)
+
+
+def warm(names=None):
+    return reference_cache.warm(names)
+
+
+def invalidate(*tables):
+    # Drop local copies now and bump the shared versions once the data is committed
+    reference_cache.discard(tables)
+    keys = [version_key(table) for table in tables]
+    transaction.on_commit(lambda: bump(keys))
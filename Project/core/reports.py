@@ -0,0 +1,262 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import Category, Item, Maintenance
+from reservations.models import Reservation, ReservationItem
+from .models import DailyCategorySnapshot
+
+# Report figures, computed live or rolled up per day into DailyCategorySnapshot.
+
+ACTIVE_MAINTENANCE_STATUSES = ['SCHEDULED', 'IN_PROGRESS']
+# Reservations whose items are out with the customer once their start date
+# has passed; 'confirmed' covers bookings the lifecycle job has not activated yet
+OUT_STATUSES = ['confirmed', 'active', 'overdue']
+# Reservations whose revenue and start/end count when looking back at a day;
+# items are only counted as in use for OUT_STATUSES, as in the live figures
+RENTED_STATUSES = ['confirmed', 'active', 'overdue', 'completed']
+
+# Days covered by one reservation scan while building snapshots
+CHUNK_DAYS = 31
+
+SNAPSHOT_FIELDS = [
+    'total_items', 'in_use', 'in_maintenance', 'revenue',
+    'reservations_started', 'reservations_ended', 'computed_at',
+]
+
+
+def _status(total, available):
+    unavailable = total - available
+    return 'All available' if not unavailable else f'{unavailable} unavailable'
+
+
+def live_category_stats(today):
+    # Every per-category figure for today from one grouped query
+    in_use_ids = ReservationItem.objects.filter(
+        reservation__status__in=OUT_STATUSES,
+        reservation__start_date__date__lte=today,
+        reservation__end_date__date__gte=today
+    ).values('item_id')
+    in_maintenance_ids = Maintenance.objects.filter(
+        status__in=ACTIVE_MAINTENANCE_STATUSES,
+        maintenance_date__date=today
+    ).values('item_id')
+
+    categories = Category.objects.annotate(
+        total=Count('items'),
+        available=Count('items', filter=Q(items__is_available=True)),
+        in_use=Count('items', filter=Q(items__in=in_use_ids)),
+        in_maintenance=Count('items', filter=Q(items__in=in_maintenance_ids))
+    ).order_by('name')
+
+    return [{
+        'name': category.name,
+        'total_items': category.total,
+        'available': category.available,
+        'in_use': category.in_use,
+        'in_maintenance': category.in_maintenance,
+        'status': _status(category.total, category.available)
+    } for category in categories]
+
+
+def snapshot_category_stats(day):
+    # The rolled-up figures for `day`, or None if that day was never built
+    snapshots = list(
+        DailyCategorySnapshot.objects.filter(day=day, available_items__isnull=False)
+        .select_related('category').order_by('category__name')
+    )
+    if not snapshots:
+        return None, None
+    stats = [{
+        'name': snapshot.category.name,
+        'total_items': snapshot.total_items,
+        'available': snapshot.available_items,
+        'in_use': snapshot.in_use,
+        'in_maintenance': snapshot.in_maintenance,
+        'status': _status(snapshot.total_items, snapshot.available_items)
+    } for snapshot in snapshots]
+    return stats, min(snapshot.computed_at for snapshot in snapshots)
+
+
+def daily_trends(first_day, last_day):
+    # Totals per day across categories, oldest first
+    return list(
+        DailyCategorySnapshot.objects.filter(day__range=(first_day, last_day))
+        .values('day')
+        .annotate(
+            total_items=Sum('total_items'),
+            in_use=Sum('in_use'),
+            in_maintenance=Sum('in_maintenance'),
+            revenue=Sum('revenue'),
+            reservations_started=Sum('reservations_started'),
+            reservations_ended=Sum('reservations_ended')
+        )
+        .order_by('day')
+    )
+
+
+def days_between(first_day, last_day):
+    for offset in range((last_day - first_day).days + 1):
+        yield first_day + timedelta(days=offset)
+
+
+def _window(first_day, last_day):
+    return (
+        timezone.make_aware(datetime.combine(first_day, time.min)),
+        timezone.make_aware(datetime.combine(last_day, time.max)),
+    )
+
+
+def last_computed_at():
+    return DailyCategorySnapshot.objects.aggregate(last=Max('computed_at'))['last']
+
+
+def touched_days(since, today):
+    # Days whose figures may have changed since the previous run (always includes today)
+    if since is None:
+        earliest = [
+            Reservation.objects.aggregate(day=Min('start_date'))['day'],
+            Maintenance.objects.aggregate(day=Min('maintenance_date'))['day'],
+            Item.objects.aggregate(day=Min('created_at'))['day'],
+        ]
+        earliest = [timezone.localdate(value) for value in earliest if value]
+        return sorted(days_between(min(earliest + [today]), today))
+
+    days = set(days_between(min(timezone.localdate(since), today), today))
+    changed_periods = Reservation.objects.filter(
+        Q(updated_at__gte=since) | Q(items__updated_at__gte=since)
+    ).values_list('start_date', 'end_date').order_by().distinct()
+    for start, end in changed_periods.iterator():
+        days.update(days_between(timezone.localdate(start), min(timezone.localdate(end), today)))
+    for date in Maintenance.objects.filter(updated_at__gte=since).values_list('maintenance_date', flat=True).iterator():
+        days.add(timezone.localdate(date))
+    return sorted(day for day in days if day <= today)
+
+
+def _chunks(days):
+    chunk = []
+    for day in days:
+        if chunk and (day - chunk[0]).days >= CHUNK_DAYS:
+            yield chunk
+            chunk = []
+        chunk.append(day)
+    if chunk:
+        yield chunk
+
+
+def _item_totals(days, category_ids):
+    # Items per category that existed at the end of each day, from one grouped query
+    created = defaultdict(int)
+    for category_id, day, count in (
+        Item.objects.annotate(day=TruncDate('created_at'))
+        .values_list('category_id', 'day').annotate(count=Count('id')).order_by()
+    ):
+        created[category_id, day] += count
+    totals = {}
+    for category_id in category_ids:
+        per_day = sorted((day, count) for (cat, day), count in created.items() if cat == category_id)
+        running, i = 0, 0
+        for day in days:
+            while i < len(per_day) and per_day[i][0] <= day:
+                running += per_day[i][1]
+                i += 1
+            totals[day, category_id] = running
+    return totals
+
+
+def _build_chunk(days, stats):
+    first_day, last_day = days[0], days[-1]
+    window_start, window_end = _window(first_day, last_day)
+    wanted = set(days)
+
+    in_use = defaultdict(set)
+    started = defaultdict(set)
+    ended = defaultdict(set)
+    revenue = defaultdict(Decimal)
+    rows = ReservationItem.objects.filter(
+        reservation__status__in=set(RENTED_STATUSES) | set(OUT_STATUSES),
+        reservation__start_date__lte=window_end,
+        reservation__end_date__gte=window_start
+    ).values_list(
+        'item__category_id', 'item_id', 'reservation_id', 'reservation__status',
+        'reservation__start_date', 'reservation__end_date', 'price_per_day', 'quantity'
+    )
+    for category_id, item_id, reservation_id, status, start, end, price, quantity in rows.iterator(chunk_size=2000):
+        start_day, end_day = timezone.localdate(start), timezone.localdate(end)
+        out, rented = status in OUT_STATUSES, status in RENTED_STATUSES
+        for day in days_between(max(start_day, first_day), min(end_day, last_day)):
+            if day in wanted:
+                if out:
+                    in_use[day, category_id].add(item_id)
+                if rented:
+                    revenue[day, category_id] += price * quantity
+        if not rented:
+            continue
+        if start_day in wanted:
+            started[start_day, category_id].add(reservation_id)
+        if end_day in wanted:
+            ended[end_day, category_id].add(reservation_id)
+
+    in_maintenance = defaultdict(set)
+    for category_id, item_id, date in Maintenance.objects.filter(
+        status__in=ACTIVE_MAINTENANCE_STATUSES,
+        maintenance_date__range=(window_start, window_end)
+    ).values_list('item__category_id', 'item_id', 'maintenance_date').iterator(chunk_size=2000):
+        in_maintenance[timezone.localdate(date), category_id].add(item_id)
+
+    for key, row in stats.items():
+        if key[0] not in wanted:
+            continue
+        row['in_use'] = len(in_use[key])
+        row['in_maintenance'] = len(in_maintenance[key])
+        row['revenue'] = revenue[key]
+        row['reservations_started'] = len(started[key])
+        row['reservations_ended'] = len(ended[key])
+
+
+def build_snapshots(days):
+    # Recompute and upsert the rollup rows for `days`; returns the number of rows written
+    days = sorted(set(days))
+    if not days:
+        return 0
+    today = timezone.localdate()
+    computed_at = timezone.now()
+    category_ids = list(Category.objects.values_list('id', flat=True))
+    totals = _item_totals(days, category_ids)
+    stats = {
+        (day, category_id): {'total_items': totals[day, category_id]}
+        for day in days for category_id in category_ids
+    }
+    for chunk in _chunks(days):
+        _build_chunk(chunk, stats)
+
+    available = {}
+    if today in days:
+        available = dict(
+            Item.objects.filter(is_available=True).values_list('category_id')
+            .annotate(count=Count('id')).order_by()
+        )
+
+    past, current = [], []
+    for (day, category_id), row in stats.items():
+        snapshot = DailyCategorySnapshot(day=day, category_id=category_id, computed_at=computed_at, **row)
+        if day == today:
+            snapshot.available_items = available.get(category_id, 0)
+            current.append(snapshot)
+        else:
+            past.append(snapshot)
+
+    # Past days keep whatever availability was recorded when they were "today"
+    for snapshots, fields in ((past, SNAPSHOT_FIELDS), (current, SNAPSHOT_FIELDS + ['available_items'])):
+        DailyCategorySnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['day', 'category'],
+            update_fields=fields,
+            batch_size=500
+        )
+    return len(stats)
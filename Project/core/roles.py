@@ -0,0 +1,139 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import transaction
+
+from .cache_versions import bump, get_version, is_shared
+from .models import UserProfile
+
+# Role authorization.
+# RoleMiddleware resolves the signed-in user's role once per request, from
+# the session when the per-user role version in the shared cache still
+# matches, otherwise (or without a shared cache) from the profile row in the
+# database. Every check below reads that result, so authorization costs no
+# queries after the first request of a session.
+
+CUSTOMER = 'customer'
+STAFF = 'staff'
+MANAGER = 'manager'
+ADMIN = 'admin'
+
+STAFF_ROLES = (STAFF, MANAGER, ADMIN)
+MANAGER_ROLES = (MANAGER, ADMIN)
+
+ROLE_LABELS = dict(UserProfile.ROLE_CHOICES)
+
+SESSION_ROLE_KEY = 'user_role'
+SESSION_VERSION_KEY = 'user_role_version'
+
+
+def version_key(user_id):
+    return f'role:user:{user_id}'
+
+
+def _profile_role(user):
+    # The role stored on the profile; None for users without one
+    profile = getattr(user, 'userprofile', None)
+    return profile.role if profile is not None else None
+
+
+def _stored_role(user):
+    # The role in the database. request.user may come from the per-process
+    # user cache (users.backends), whose profile can predate a change made
+    # by another worker, so it is not used when the session copy is stale.
+    return UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).first()
+
+
+def get_role(user):
+    # The user's role, as resolved by RoleMiddleware when it ran for this request
+    if not user.is_authenticated:
+        return None
+    if not hasattr(user, '_role'):
+        user._role = _profile_role(user)
+    return user._role
+
+
+def remember_role(request, role):
+    # Store the role in the session together with the version it is valid for
+    user = request.user
+    version = get_version(version_key(user.pk)) if is_shared() else None
+    user._role = role
+    if version is None:
+        # No shared cache to validate against; never trust the session copy
+        request.session.pop(SESSION_ROLE_KEY, None)
+        request.session.pop(SESSION_VERSION_KEY, None)
+        return
+    if request.session.get(SESSION_ROLE_KEY) != role or request.session.get(SESSION_VERSION_KEY) != version:
+        request.session[SESSION_ROLE_KEY] = role
+        request.session[SESSION_VERSION_KEY] = version
+
+
+def resolve_role(request):
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    session_role = request.session.get(SESSION_ROLE_KEY)
+    session_version = request.session.get(SESSION_VERSION_KEY)
+    # A demotion handled by another worker only reaches this one through a
+    # shared cache; with a process-local one the profile is always read
+    if session_version is not None and is_shared() and session_version == get_version(version_key(user.pk)):
+        user._role = session_role
+        return session_role
+    role = _stored_role(user)
+    remember_role(request, role)
+    return role
+
+
+def invalidate_role(user_id):
+    # Make every session holding this user's role fall back to the profile
+    transaction.on_commit(lambda: bump([version_key(user_id)]))
+
+
+def has_role(user, roles):
+    return get_role(user) in roles
+
+
+def is_staff_or_manager(user):
+    return has_role(user, STAFF_ROLES)
+
+
+def is_manager(user):
+    return has_role(user, MANAGER_ROLES)
+
+
+def is_admin(user):
+    return has_role(user, (ADMIN,))
+
+
+class RoleMiddleware:
+    # Must come after AuthenticationMiddleware. Works in both modes so async
+    # views are not forced through a sync adapter.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.role = resolve_role(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.role = await sync_to_async(resolve_role)(request)
+        return await self.get_response(request)
+
+
+def roles(request):
+    # Template context processor
+    role = getattr(request, 'role', None)
+    if role is None and hasattr(request, 'user'):
+        role = get_role(request.user)
+    return {
+        'user_role': role,
+        'user_role_display': ROLE_LABELS.get(role, ''),
+        'is_staff_role': role in STAFF_ROLES,
+        'is_manager_role': role in MANAGER_ROLES,
+        'is_admin_role': role == ADMIN,
+    }
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inventory.models import Category, Item
+from . import reference_cache
+from .models import UserProfile
+from .roles import invalidate_role
+
+# Sessions cache the user's role; a profile change must reach them
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_role_changed(sender, instance, **kwargs):
+    invalidate_role(instance.user_id)
+
+
+# Category menus and item pickers are served from the reference cache
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    reference_cache.invalidate(reference_cache.CATEGORY)
+
+
+@receiver([post_save, post_delete], sender=Item)
+def item_changed(sender, instance, **kwargs):
+    reference_cache.invalidate(reference_cache.ITEM)
@@ -1,13 +1,35 @@
-from django.test import TestCase, override_settings
+from asgiref.sync import sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+from io import StringIO
+from inventory.importer import InventoryImporter
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 from decimal import Decimal
 
 from inventory.models import Category, Item
+from users.backends import user_cache
 from users.models import User
-from core.models import UserProfile, Maintenance
+from core import assets, cache_versions, query_plans, reference_cache, reports, roles
+from core.forms import MaintenanceForm
+from core.models import DailyCategorySnapshot, UserProfile, Maintenance
+from core.pagination import PAGE_SIZE
+from reservations import availability, services
 from reservations.models import Reservation, ReservationItem
+from reservations.services import complete_returns
+
+# Upper bound on queries for one reports page view
+REPORT_QUERY_BUDGET = 6
 
 @override_settings(USE_TZ=True)
 class MaintenanceAndReservationTest(TestCase):
@@ -127,7 +149,8 @@ class MaintenanceAndReservationTest(TestCase):
         self.assertIsNotNone(reservation)
         self.assertTrue(reservation.start_date.tzinfo is not None)
         self.assertTrue(reservation.end_date.tzinfo is not None)
-        self.assertEqual(reservation.status, 'active')
+        # Starts tomorrow, so it waits for the lifecycle engine to activate it
+        self.assertEqual(reservation.status, 'confirmed')
 
     def test_reserve_item_validation(self):
         self.client.login(username='customer', password='password')
@@ -245,3 +268,1036 @@ class MaintenanceAndReservationTest(TestCase):
         self.client.login(username='customer', password='password')
         response = self.client.get(reverse('reports'))
         self.assertEqual(response.status_code, 403)
+
+
+class AvailabilityCalendarTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='password'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.items = [
+            Item.objects.create(
+                name=f'Item {i}',
+                description='Test Description',
+                category=self.category,
+                daily_rate=Decimal('20.00'),
+                condition='Excellent'
+            )
+            for i in range(3)
+        ]
+        self.today = timezone.localdate()
+
+    def test_bitmaps_for_several_items_in_one_query(self):
+        start = timezone.now() + timedelta(days=2)
+        reservation = Reservation.objects.create(
+            user=self.user,
+            start_date=start,
+            end_date=start + timedelta(days=2),
+            status='active',
+            total_cost=Decimal('60.00')
+        )
+        ReservationItem.objects.create(
+            reservation=reservation,
+            item=self.items[0],
+            price_per_day=Decimal('20.00'),
+            subtotal=Decimal('60.00')
+        )
+        Maintenance.objects.create(
+            item=self.items[1],
+            staff=self.user,
+            maintenance_date=timezone.now() + timedelta(days=5),
+            description='Service'
+        )
+
+        ids = ','.join(str(item.id) for item in self.items)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('item_availability'), {'items': ids, 'days': 10})
+        self.assertEqual(response.status_code, 200)
+        bitmaps = response.json()['items']
+        self.assertEqual(bitmaps[str(self.items[0].id)], '1100011111')
+        self.assertEqual(bitmaps[str(self.items[1].id)], '1111101111')
+        self.assertEqual(bitmaps[str(self.items[2].id)], '1' * 10)
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('item_availability'), {'items': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('item_availability'), {'items': self.items[0].id, 'days': 1000})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogPaginationTest(TestCase):
+    def setUp(self):
+        self.tools = Category.objects.create(name='Tools')
+        self.audio = Category.objects.create(name='Audio')
+        for i in range(PAGE_SIZE + 5):
+            Item.objects.create(
+                name=f'Tool {i:02d}',
+                description='A long description ' * 50,
+                category=self.tools,
+                daily_rate=Decimal('10.00'),
+                condition='Excellent'
+            )
+        # Duplicate names are ordered by id, so no row is skipped or repeated
+        Item.objects.create(name='Tool 00', description='Duplicate', category=self.tools,
+                            daily_rate=Decimal('10.00'), condition='Good')
+        Item.objects.create(name='Speaker', description='Loud', category=self.audio,
+                            daily_rate=Decimal('30.00'), condition='Good')
+
+    def test_cursor_walks_every_item_once(self):
+        response = self.client.get(reverse('catalog'), {'category': self.tools.id})
+        first_page = response.context['items']
+        self.assertEqual(len(first_page), PAGE_SIZE)
+        self.assertIn('description', first_page[0].get_deferred_fields())
+        self.assertLessEqual(len(first_page[0].summary), 161)
+
+        cursor = response.context['next_cursor']
+        self.assertIsNotNone(cursor)
+        # Rows added before the cursor position do not shift the next page
+        Item.objects.create(name='AAA Tool', description='New', category=self.tools,
+                            daily_rate=Decimal('10.00'), condition='Good')
+        response = self.client.get(reverse('catalog'), {'category': self.tools.id, 'cursor': cursor})
+        second_page = response.context['items']
+        self.assertIsNone(response.context['next_cursor'])
+
+        seen = [item.id for item in first_page] + [item.id for item in second_page]
+        expected = list(Item.objects.filter(category=self.tools).exclude(name='AAA Tool')
+                        .order_by('name', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        response = self.client.get(reverse('catalog'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['items'][0].name, 'Speaker')
+
+    def test_one_reservation_dialog_per_page(self):
+        user = User.objects.create_user(username='customer', email='customer@example.com', password='password')
+        self.client.force_login(user)
+        response = self.client.get(reverse('catalog'), {'category': self.tools.id})
+        content = response.content.decode()
+        self.assertEqual(content.count('class="modal fade"'), 1)
+        self.assertEqual(content.count('data-reserve-item='), PAGE_SIZE)
+        self.assertIn(reverse('api_item_detail', args=[0]), content)
+
+
+class CatalogPeriodFilterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='customer', email='customer@example.com', password='password')
+        self.tools = Category.objects.create(name='Tools')
+        self.audio = Category.objects.create(name='Audio')
+        self.drill = Item.objects.create(name='Drill', description='Cordless', category=self.tools,
+                                         daily_rate=Decimal('10.00'), condition='Excellent')
+        self.saw = Item.objects.create(name='Saw', description='Sharp', category=self.tools,
+                                       daily_rate=Decimal('8.00'), condition='Good')
+        self.sander = Item.objects.create(name='Sander', description='Smooth', category=self.tools,
+                                          daily_rate=Decimal('9.00'), condition='Good')
+        self.speaker = Item.objects.create(name='Speaker', description='Loud', category=self.audio,
+                                           daily_rate=Decimal('30.00'), condition='Good')
+        self.first_day = timezone.localdate() + timedelta(days=10)
+        self.period = {'start': self.day(0), 'end': self.day(3)}
+
+    def day(self, offset):
+        return (self.first_day + timedelta(days=offset)).isoformat()
+
+    def at(self, offset):
+        return timezone.make_aware(datetime.combine(self.first_day + timedelta(days=offset), time.min))
+
+    def reserve(self, item, first, last, status='active'):
+        reservation = Reservation.objects.create(user=self.user, start_date=self.at(first), end_date=self.at(last),
+                                                 status=status, total_cost=Decimal('10.00'))
+        ReservationItem.objects.create(reservation=reservation, item=item,
+                                       price_per_day=item.daily_rate, subtotal=item.daily_rate)
+        return reservation
+
+    def listed(self, params):
+        response = self.client.get(reverse('catalog'), params)
+        self.assertEqual(response.status_code, 200)
+        return [item.name for item in response.context['items']]
+
+    def test_blocked_items_are_left_out(self):
+        self.reserve(self.drill, 2, 5)
+        self.reserve(self.saw, 1, 2, status='cancelled')
+        self.reserve(self.saw, 4, 6)
+        Maintenance.objects.create(item=self.sander, staff=self.user, maintenance_date=self.at(3),
+                                   description='Service', status='SCHEDULED')
+        Maintenance.objects.create(item=self.speaker, staff=self.user, maintenance_date=self.at(1),
+                                   description='Done', status='COMPLETED')
+
+        self.assertEqual(self.listed(self.period), ['Saw', 'Speaker'])
+        self.assertEqual(self.listed(dict(self.period, category=self.tools.id)), ['Saw'])
+        self.assertEqual(self.listed({'start': self.day(5), 'end': self.day(6)}), ['Sander', 'Speaker'])
+        # Exactly the items a booking for the period would accept
+        free = set(Item.objects.filter(availability.free_during(self.at(0), self.at(3))).values_list('id', flat=True))
+        conflicts = availability.find_conflicts_in_db(list(Item.objects.values_list('id', flat=True)),
+                                                      self.at(0), self.at(3))
+        self.assertEqual(free, set(Item.objects.exclude(id__in=conflicts).values_list('id', flat=True)))
+
+    def test_empty_period_names_the_category_only_when_one_is_chosen(self):
+        for item in Item.objects.all():
+            self.reserve(item, 0, 3)
+        response = self.client.get(reverse('catalog'), self.period)
+        self.assertContains(response, 'No equipment is free for those dates.')
+        self.assertNotContains(response, 'in this category')
+        response = self.client.get(reverse('catalog'), dict(self.period, category=self.tools.id))
+        self.assertContains(response, 'No equipment in this category is free for those dates.')
+
+    def test_filter_is_part_of_the_page_query(self):
+        self.reserve(self.drill, 0, 1)
+        self.client.get(reverse('catalog'))
+        with CaptureQueriesContext(connection) as unfiltered:
+            self.client.get(reverse('catalog'))
+        with CaptureQueriesContext(connection) as filtered:
+            self.client.get(reverse('catalog'), self.period)
+        # Only the two validator aggregates over the period are added
+        self.assertEqual(len(filtered), len(unfiltered) + 2)
+        self.assertEqual(sum('NOT EXISTS' in query['sql'] for query in filtered.captured_queries), 1)
+
+    def test_pages_and_links_keep_the_period(self):
+        for i in range(2 * PAGE_SIZE + 2):
+            item = Item.objects.create(name=f'Tool {i:02d}', description='Spare', category=self.tools,
+                                       daily_rate=Decimal('10.00'), condition='Good')
+            if i % 2:
+                self.reserve(item, 1, 2)
+        params = dict(self.period, category=self.tools.id)
+        response = self.client.get(reverse('catalog'), params)
+        self.assertContains(response, f'start={self.day(0)}&amp;end={self.day(3)}&amp;cursor=')
+        self.assertContains(response, f'?category={self.audio.id}&amp;start={self.day(0)}')
+
+        seen = [item.name for item in response.context['items']]
+        response = self.client.get(reverse('catalog'), dict(params, cursor=response.context['next_cursor']))
+        seen += [item.name for item in response.context['items']]
+        expected = list(Item.objects.filter(availability.free_during(self.at(0), self.at(3)), category=self.tools)
+                        .order_by('name', 'id').values_list('name', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(expected), PAGE_SIZE + 4)
+
+    def test_invalid_period_shows_every_item(self):
+        response = self.client.get(reverse('catalog'), {'start': self.day(3), 'end': self.day(0)})
+        self.assertEqual(len(response.context['items']), 4)
+        self.assertContains(response, 'End date must be after start date.')
+        response = self.client.get(reverse('catalog'), {'start': self.day(0)})
+        self.assertContains(response, 'Please provide both start and end dates.')
+        response = self.client.get(reverse('catalog'), {'start': 'soon', 'end': self.day(0)})
+        self.assertContains(response, 'Invalid date format.')
+
+    def test_new_booking_in_period_changes_the_etag(self):
+        first = self.client.get(reverse('catalog'), self.period)
+        # Bookings outside the period do not matter
+        self.reserve(self.drill, 20, 21)
+        response = self.client.get(reverse('catalog'), self.period, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        reservation = self.reserve(self.drill, 1, 2)
+        response = self.client.get(reverse('catalog'), self.period, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Drill', [item.name for item in response.context['items']])
+
+        reservation.status = 'cancelled'
+        reservation.save()
+        response = self.client.get(reverse('catalog'), self.period, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Drill', [item.name for item in response.context['items']])
+
+
+class ReportsTest(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@manager.com',
+            password='password',
+            is_staff=True
+        )
+        UserProfile.objects.filter(user=self.manager).update(role='manager')
+        self.client.force_login(self.manager)
+
+    def add_category(self, name, items=2):
+        category = Category.objects.create(name=name)
+        return [
+            Item.objects.create(
+                name=f'{name} {i}',
+                description='Test Description',
+                category=category,
+                daily_rate=Decimal('10.00'),
+                condition='Excellent'
+            )
+            for i in range(items)
+        ]
+
+    def count_report_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('reports'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_categories(self):
+        self.add_category('Audio')
+        # The first request of a session stores the role in it
+        self.count_report_queries()
+        baseline = self.count_report_queries()
+        for name in ['Camping', 'Lighting', 'Tools', 'Video']:
+            self.add_category(name)
+        self.assertEqual(self.count_report_queries(), baseline)
+        # Session and user+profile lookups plus the report queries
+        self.assertLessEqual(baseline, REPORT_QUERY_BUDGET)
+
+    def test_category_stats(self):
+        audio = self.add_category('Audio', items=3)
+        audio[2].is_available = False
+        audio[2].save()
+        Maintenance.objects.create(
+            item=audio[0],
+            staff=self.manager,
+            maintenance_date=timezone.now(),
+            description='Service',
+            status='IN_PROGRESS'
+        )
+        reservation = Reservation.objects.create(
+            user=self.manager,
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=1),
+            status='active',
+            total_cost=Decimal('30.00')
+        )
+        ReservationItem.objects.create(
+            reservation=reservation,
+            item=audio[1],
+            price_per_day=Decimal('10.00'),
+            subtotal=Decimal('30.00')
+        )
+        Category.objects.create(name='Empty')
+
+        response = self.client.get(reverse('reports'))
+        stats = {row['name']: row for row in response.context['category_stats']}
+        self.assertEqual(stats['Audio']['total_items'], 3)
+        self.assertEqual(stats['Audio']['available'], 2)
+        self.assertEqual(stats['Audio']['in_use'], 1)
+        self.assertEqual(stats['Audio']['in_maintenance'], 1)
+        self.assertEqual(stats['Empty']['total_items'], 0)
+        self.assertEqual(response.context['total_items'], 3)
+        self.assertEqual(response.context['in_maintenance'], 1)
+        self.assertEqual(response.context['active_reservations'], 1)
+
+    def test_snapshots_feed_reports_and_trends(self):
+        audio = self.add_category('Audio', items=2)
+        start = timezone.now() - timedelta(days=3)
+        Item.objects.update(created_at=start - timedelta(days=1))
+        reservation = Reservation.objects.create(
+            user=self.manager,
+            start_date=start,
+            end_date=start + timedelta(days=2),
+            status='overdue',
+            total_cost=Decimal('30.00')
+        )
+        ReservationItem.objects.create(
+            reservation=reservation,
+            item=audio[0],
+            quantity=2,
+            price_per_day=Decimal('10.00'),
+            subtotal=Decimal('60.00')
+        )
+
+        call_command('build_report_snapshots', stdout=StringIO())
+        category = audio[0].category
+        day = timezone.localdate(start)
+        snapshot = DailyCategorySnapshot.objects.get(day=day, category=category)
+        self.assertEqual(snapshot.total_items, 2)
+        self.assertEqual(snapshot.in_use, 1)
+        self.assertEqual(snapshot.revenue, Decimal('20.00'))
+        self.assertEqual(snapshot.reservations_started, 1)
+        self.assertIsNone(snapshot.available_items)
+        self.assertEqual(
+            DailyCategorySnapshot.objects.get(day=timezone.localdate(), category=category).available_items, 2
+        )
+
+        # Nothing changed, so an incremental run only rebuilds today
+        self.assertEqual(reports.touched_days(reports.last_computed_at(), timezone.localdate()),
+                         [timezone.localdate()])
+
+        response = self.client.get(reverse('reports'))
+        self.assertIsNotNone(response.context['computed_at'])
+        self.assertEqual(response.context['total_items'], 2)
+
+        response = self.client.get(reverse('report_trends'), {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        trends = {row['day']: row for row in response.context['trends']}
+        self.assertEqual(trends[day]['in_use'], 1)
+
+
+    def test_snapshot_agrees_with_live_stats(self):
+        audio = self.add_category('Audio', items=4)
+        Item.objects.update(created_at=timezone.now() - timedelta(days=5))
+        now = timezone.now()
+        for item, status in zip(audio, ['active', 'completed', 'cancelled']):
+            reservation = Reservation.objects.create(user=self.manager, start_date=now - timedelta(hours=1),
+                                                     end_date=now + timedelta(hours=1), status=status,
+                                                     total_cost=Decimal('10.00'))
+            ReservationItem.objects.create(reservation=reservation, item=item,
+                                           price_per_day=Decimal('10.00'), subtotal=Decimal('10.00'))
+        for item, status in zip(audio, ['SCHEDULED', 'COMPLETED', 'CANCELLED', 'IN_PROGRESS']):
+            Maintenance.objects.create(item=item, staff=self.manager, maintenance_date=now,
+                                       description='Service', status=status)
+
+        today = timezone.localdate()
+        live = reports.live_category_stats(today)
+        self.assertEqual((live[0]['in_use'], live[0]['in_maintenance']), (1, 2))
+        call_command('build_report_snapshots', stdout=StringIO())
+        self.assertEqual(reports.snapshot_category_stats(today)[0], live)
+
+    def test_started_confirmed_reservations_count_as_out(self):
+        # Bookings the lifecycle job has not activated yet
+        audio = self.add_category('Audio', items=2)
+        Item.objects.update(created_at=timezone.now() - timedelta(days=5))
+        now = timezone.now()
+        for item, start in zip(audio, [now - timedelta(hours=1), now + timedelta(days=2)]):
+            reservation = Reservation.objects.create(user=self.manager, start_date=start,
+                                                     end_date=start + timedelta(days=1), status='confirmed',
+                                                     total_cost=Decimal('20.00'))
+            ReservationItem.objects.create(reservation=reservation, item=item,
+                                           price_per_day=Decimal('10.00'), subtotal=Decimal('20.00'))
+
+        response = self.client.get(reverse('reports'))
+        self.assertEqual(response.context['category_stats'][0]['in_use'], 1)
+        self.assertEqual(response.context['active_reservations'], 1)
+        call_command('build_report_snapshots', stdout=StringIO())
+        response = self.client.get(reverse('reports'))
+        self.assertIsNotNone(response.context['computed_at'])
+        self.assertEqual(response.context['category_stats'][0]['in_use'], 1)
+
+class CartCheckoutTest(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='password'
+        )
+        self.client.force_login(self.customer)
+        category = Category.objects.create(name='Camping')
+        self.items = [
+            Item.objects.create(
+                name=name,
+                description='Test Description',
+                category=category,
+                daily_rate=rate,
+                condition='Excellent'
+            )
+            for name, rate in [('Tent', Decimal('20.00')), ('Stove', Decimal('5.00')), ('Lantern', Decimal('2.50'))]
+        ]
+        self.dates = {
+            'start_date': (timezone.now() + timedelta(days=1)).strftime('%Y-%m-%d'),
+            'end_date': (timezone.now() + timedelta(days=3)).strftime('%Y-%m-%d'),
+        }
+
+    def test_checkout_books_all_cart_items_in_one_reservation(self):
+        for item in self.items:
+            self.client.post(reverse('add_to_cart', kwargs={'item_id': item.id}))
+        self.assertEqual(len(self.client.session['cart']), 3)
+
+        response = self.client.post(reverse('checkout'), self.dates)
+        self.assertRedirects(response, reverse('my_reservations'))
+        reservation = Reservation.objects.get(user=self.customer)
+        self.assertEqual(reservation.items.count(), 3)
+        self.assertEqual(reservation.total_cost, Decimal('82.50'))
+        self.assertEqual(self.client.session['cart'], [])
+
+    def test_conflicting_checkout_books_nothing(self):
+        self.client.post(reverse('checkout'), {'item_ids': [self.items[0].id], **self.dates})
+        response = self.client.post(
+            reverse('checkout'),
+            {'item_ids': [item.id for item in self.items], **self.dates},
+            follow=True
+        )
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertContains(response, 'Tent is already reserved for the selected dates.')
+
+
+class BulkReturnTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='password')
+        UserProfile.objects.filter(user=self.staff).update(role='staff')
+        self.customer = User.objects.create_user(username='customer', email='customer@example.com', password='password')
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name='Camping')
+        self.reservations = []
+        for i, status in enumerate(['active', 'active', 'cancelled']):
+            item = Item.objects.create(
+                name=f'Item {i}',
+                description='Test Description',
+                category=category,
+                daily_rate=Decimal('10.00'),
+                condition='Excellent',
+                is_available=False
+            )
+            reservation = Reservation.objects.create(
+                user=self.customer,
+                start_date=timezone.now() - timedelta(days=3),
+                end_date=timezone.now() - timedelta(days=1),
+                status=status,
+                total_cost=Decimal('30.00')
+            )
+            ReservationItem.objects.create(
+                reservation=reservation,
+                item=item,
+                price_per_day=item.daily_rate,
+                subtotal=Decimal('30.00')
+            )
+            self.reservations.append(reservation)
+
+    def test_bulk_return_reports_each_outcome(self):
+        ids = [reservation.id for reservation in self.reservations] + [9999]
+        response = self.client.post(
+            reverse('bulk_process_returns'),
+            {'reservation_ids': ids},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['completed'], 2)
+        self.assertEqual(
+            [result['outcome'] for result in data['results']],
+            ['completed', 'completed', 'skipped', 'not_found']
+        )
+        self.assertEqual(Reservation.objects.filter(status='completed').count(), 2)
+        self.assertEqual(Item.objects.filter(is_available=True).count(), 2)
+
+    def test_bulk_return_uses_constant_queries(self):
+        ids = [reservation.id for reservation in self.reservations[:2]]
+        with CaptureQueriesContext(connection) as queries:
+            complete_returns(ids[:1])
+        Reservation.objects.filter(id=ids[0]).update(status='active')
+        with CaptureQueriesContext(connection) as more_queries:
+            complete_returns(ids)
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_concurrent_return_is_not_reported_twice(self):
+        ids = [reservation.id for reservation in self.reservations[:2]]
+        read_statuses = services._statuses
+
+        def statuses_then_concurrent_return(reservation_ids):
+            # Another request completes the first return after this one read the statuses
+            statuses = read_statuses(reservation_ids)
+            Reservation.objects.filter(id=ids[0]).update(status='completed', completed_at=timezone.now())
+            return statuses
+
+        with mock.patch.object(services, '_statuses', statuses_then_concurrent_return):
+            outcomes = complete_returns(ids)
+        self.assertEqual([outcome['outcome'] for outcome in outcomes], ['skipped', 'completed'])
+        # Only the item of the return this call made is freed here
+        self.assertEqual(list(Item.objects.filter(is_available=True).values_list('name', flat=True)), ['Item 1'])
+
+    def test_bulk_return_form_redirects_with_messages(self):
+        response = self.client.post(
+            reverse('bulk_process_returns'),
+            {'reservation_ids': [self.reservations[0].id, self.reservations[2].id]},
+            follow=True
+        )
+        self.assertRedirects(response, reverse('manage_returns'))
+        self.assertContains(response, '1 return(s) processed successfully.')
+        self.assertContains(response, 'Reservation is cancelled.')
+
+
+class QueryPlanTest(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('All hot queries use an index.', out.getvalue())
+
+    def test_full_scan_is_detected(self):
+        plan = '2 0 0 SCAN inventory_item\n5 0 0 SCAN inventory_maintenance USING INDEX maintenance_status_date_idx'
+        self.assertEqual(query_plans.full_scans(plan, 'sqlite'), ['inventory_item'])
+
+    def test_index_scan_followed_by_a_sort_is_a_full_scan(self):
+        plan = ('7 0 0 SCAN inventory_maintenance USING INDEX inventory_maintenance_item_id_6da64a27\n'
+                '10 0 0 SEARCH inventory_item USING INTEGER PRIMARY KEY (rowid=?)\n'
+                '56 0 0 USE TEMP B-TREE FOR ORDER BY')
+        self.assertEqual(query_plans.full_scans(plan, 'sqlite'), ['inventory_maintenance'])
+        plan = '7 0 0 SCAN inventory_maintenance USING INDEX maintenance_date_id_idx'
+        self.assertEqual(query_plans.full_scans(plan, 'sqlite'), [])
+
+
+class MaintenanceScheduleTest(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='password')
+        UserProfile.objects.filter(user=self.manager).update(role='manager')
+        self.client.force_login(self.manager)
+        category = Category.objects.create(name='Tools')
+        self.items = [
+            Item.objects.create(
+                name=f'Drill {i}',
+                description='Test Description',
+                category=category,
+                daily_rate=Decimal('10.00'),
+                condition='Excellent'
+            )
+            for i in range(2)
+        ]
+        self.records = [
+            Maintenance.objects.create(
+                item=self.items[i % 2],
+                staff=self.manager,
+                maintenance_date=timezone.now() + timedelta(days=i + 1),
+                description='Service',
+                status='COMPLETED' if i < 3 else 'SCHEDULED'
+            )
+            for i in range(30)
+        ]
+
+    def test_schedule_is_paginated_with_one_aggregate(self):
+        response = self.client.get(reverse('maintenance_schedule'))
+        self.assertEqual(len(response.context['maintenance_records']), 25)
+        self.assertEqual(response.context['analytics']['total_records'], 30)
+        self.assertEqual(response.context['analytics']['completed_count'], 3)
+        self.assertEqual(response.context['analytics']['scheduled_count'], 27)
+
+        with CaptureQueriesContext(connection) as first_page:
+            self.client.get(reverse('maintenance_schedule'))
+        with CaptureQueriesContext(connection) as last_page:
+            self.client.get(reverse('maintenance_schedule'), {'page': 2})
+        self.assertEqual(len(first_page), len(last_page))
+
+    def test_schedule_filters(self):
+        day = timezone.localdate(self.records[5].maintenance_date)
+        response = self.client.get(reverse('maintenance_schedule'), {
+            'status': 'SCHEDULED',
+            'item': self.items[1].id,
+            'date_from': day.isoformat(),
+            'date_to': day.isoformat()
+        })
+        self.assertEqual(list(response.context['maintenance_records']), [self.records[5]])
+
+    def test_bulk_status_update(self):
+        ids = [record.id for record in self.records[3:6]]
+        response = self.client.post(
+            reverse('maintenance_schedule') + '?status=SCHEDULED',
+            {'action': 'bulk_update_status', 'maintenance_ids': ids, 'status': 'IN_PROGRESS'}
+        )
+        self.assertRedirects(response, reverse('maintenance_schedule') + '?status=SCHEDULED')
+        self.assertEqual(Maintenance.objects.filter(status='IN_PROGRESS').count(), 3)
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='password')
+        UserProfile.objects.filter(user=self.manager).update(role='manager')
+        self.customer = User.objects.create_user(username='customer', email='customer@example.com', password='password')
+        category = Category.objects.create(name='Camping')
+        self.item = Item.objects.create(
+            name='Tent', description='Test Description', category=category,
+            daily_rate=Decimal('20.00'), condition='Excellent'
+        )
+        for days, status in ((1, 'active'), (10, 'cancelled'), (40, 'active')):
+            reservation = Reservation.objects.create(
+                user=self.customer,
+                start_date=timezone.now() + timedelta(days=days),
+                end_date=timezone.now() + timedelta(days=days + 2),
+                status=status,
+                total_cost=Decimal('60.00')
+            )
+            ReservationItem.objects.create(
+                reservation=reservation, item=self.item,
+                price_per_day=self.item.daily_rate, subtotal=Decimal('60.00')
+            )
+
+    def test_csv_export_streams_filtered_rows_in_one_query(self):
+        self.client.force_login(self.manager)
+        end = (timezone.localdate() + timedelta(days=20)).isoformat()
+        response = self.client.get(reverse('export_data', args=['reservation_items']), {'status': 'active', 'end': end})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'reservation_id', 'user_email', 'status'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('customer@example.com', lines[1])
+        self.assertIn('Tent', lines[1])
+
+    def test_export_rejects_bad_filters_and_non_managers(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('export_data', args=['reservations']), {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('export_data', args=['reservations']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_command_jsonl(self):
+        out = StringIO()
+        call_command('export_data', 'reservations', '--format', 'jsonl', '--status', 'cancelled', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['status'] for row in rows], ['cancelled'])
+        self.assertEqual(rows[0]['user_email'], 'customer@example.com')
+
+
+class RoleAuthorizationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='password')
+        profile = self.staff.userprofile
+        profile.role = 'staff'
+        profile.save()
+        self.session = {}
+
+    def make_request(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=self.staff.pk)
+        request.session = self.session
+        return request
+
+    def resolve(self):
+        return roles.resolve_role(self.make_request())
+
+    def test_role_is_read_from_session_without_queries(self):
+        self.assertEqual(self.resolve(), 'staff')
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            self.assertEqual(roles.resolve_role(request), 'staff')
+            self.assertTrue(roles.is_staff_or_manager(request.user))
+
+    def test_profile_change_invalidates_session_role(self):
+        self.resolve()
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.staff)
+            profile.role = 'manager'
+            profile.save()
+        self.assertEqual(self.resolve(), 'manager')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_session_role_is_not_trusted_without_shared_cache(self):
+        # A manager session whose demotion was handled by another worker;
+        # this worker's own cache still holds the old version
+        self.session.update({roles.SESSION_ROLE_KEY: 'manager', roles.SESSION_VERSION_KEY: 'stale'})
+        with mock.patch.object(roles, 'get_version', return_value='stale'):
+            self.assertEqual(self.resolve(), 'staff')
+        self.assertNotIn(roles.SESSION_ROLE_KEY, self.session)
+
+    def test_promoted_user_gets_manager_pages_immediately(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('reports')).status_code, 403)
+        admin = User.objects.create_user(username='boss', email='boss@example.com', password='password')
+        UserProfile.objects.filter(user=admin).update(role='admin')
+        boss = Client()
+        boss.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            boss.post(reverse('manage_staff'), {'action': 'update_role', 'user_id': self.staff.id, 'new_role': 'manager'})
+        response = self.client.get(reverse('reports'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Manager Menu')
+
+
+@override_settings(USER_CACHE_TTL=60)
+class RoleUserCacheTest(TransactionTestCase):
+    # The user cache only fills outside a transaction, so this needs real commits
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(user_cache.clear)
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='password')
+        UserProfile.objects.filter(user=self.manager).update(role='manager')
+
+    def test_demotion_by_another_worker_beats_a_stale_user_cache(self):
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse('reports')).status_code, 200)
+        # Another worker demotes the user; only its own user cache is cleared
+        UserProfile.objects.filter(user=self.manager).update(role='staff')
+        cache_versions.bump([roles.version_key(self.manager.pk)])
+        self.assertEqual(self.client.get(reverse('reports')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('reports')).status_code, 403)
+        user_cache.clear()
+        self.assertEqual(self.client.get(reverse('reports')).status_code, 403)
+
+
+class AsyncApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='customer', email='customer@example.com', password='password')
+        self.tools = Category.objects.create(name='Tools')
+        self.audio = Category.objects.create(name='Audio')
+        self.items = [
+            Item.objects.create(name=f'Tool {i:02d}', description='Sharp ' * 40, category=self.tools,
+                                daily_rate=Decimal('10.00'), condition='Excellent')
+            for i in range(PAGE_SIZE + 2)
+        ]
+        self.speaker = Item.objects.create(name='Speaker', description='Loud', category=self.audio,
+                                           daily_rate=Decimal('30.00'), condition='Good')
+        start = timezone.now() + timedelta(days=1)
+        reservation = Reservation.objects.create(user=self.user, start_date=start, end_date=start + timedelta(days=2),
+                                                 status='active', total_cost=Decimal('90.00'))
+        ReservationItem.objects.create(reservation=reservation, item=self.speaker,
+                                       price_per_day=Decimal('30.00'), subtotal=Decimal('90.00'))
+
+    async def test_item_list_pages_with_cursor(self):
+        response = await self.async_client.get(reverse('api_items'), {'category': self.tools.id})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], PAGE_SIZE + 2)
+        self.assertEqual(len(data['items']), PAGE_SIZE)
+        self.assertEqual(set(data['items'][0]), {
+            'id', 'name', 'category_id', 'summary', 'daily_rate', 'condition', 'is_available', 'thumbnail'
+        })
+        self.assertLessEqual(len(data['items'][0]['summary']), 160)
+
+        response = await self.async_client.get(reverse('api_items'), {
+            'category': self.tools.id, 'cursor': data['next_cursor']
+        })
+        rest = response.json()
+        self.assertIsNone(rest['next_cursor'])
+        self.assertEqual([item['id'] for item in data['items'] + rest['items']],
+                         [item.id for item in self.items])
+
+    async def test_item_detail(self):
+        response = await self.async_client.get(reverse('api_item_detail', args=[self.speaker.id]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['category'], {'id': self.audio.id, 'name': 'Audio'})
+        self.assertEqual(data['daily_rate'], '30.00')
+        self.assertEqual(data['upcoming_reservations'], 1)
+        self.assertFalse(data['upcoming_maintenance'])
+        self.assertEqual(data['reserve_url'], reverse('reserve_item', args=[self.speaker.id]))
+
+        response = await self.async_client.get(reverse('api_item_detail', args=[self.speaker.id + 1000]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_availability_matches_sync_endpoint(self):
+        params = {'items': ','.join(str(item.id) for item in self.items + [self.speaker]), 'days': 10}
+        response = await self.async_client.get(reverse('api_availability'), params)
+        self.assertEqual(response.status_code, 200)
+        expected = await sync_to_async(self.client.get)(reverse('item_availability'), params)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.json()['items'][str(self.speaker.id)][:4], '1000')
+
+    async def test_invalid_parameters(self):
+        response = await self.async_client.get(reverse('api_availability'), {'items': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get(reverse('api_items'), {'category': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='customer', email='customer@example.com', password='password')
+        self.tools = Category.objects.create(name='Tools')
+        self.audio = Category.objects.create(name='Audio')
+        self.drill = Item.objects.create(name='Drill', description='Cordless', category=self.tools,
+                                         daily_rate=Decimal('10.00'), condition='Excellent')
+        self.speaker = Item.objects.create(name='Speaker', description='Loud', category=self.audio,
+                                           daily_rate=Decimal('30.00'), condition='Good')
+
+    def revalidate(self, url, params=None):
+        first = self.client.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_catalog_is_not_rendered_again(self):
+        first = self.client.get(reverse('catalog'))
+        self.assertIn('Last-Modified', first)
+        self.assertIn('no-cache', first['Cache-Control'])
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('catalog'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, 'core/catalog.html')
+
+        self.drill.daily_rate = Decimal('12.00')
+        self.drill.save()
+        response = self.client.get(reverse('catalog'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '€12.00/day')
+
+    def test_validators_are_scoped_by_category(self):
+        params = {'category': self.tools.id}
+        first = self.client.get(reverse('catalog'), params)
+        self.speaker.save()
+        response = self.client.get(reverse('catalog'), params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        Item.objects.create(name='Saw', description='Sharp', category=self.tools,
+                            daily_rate=Decimal('8.00'), condition='Good')
+        response = self.client.get(reverse('catalog'), params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_signed_in_pages_depend_on_user_and_cart(self):
+        anonymous = self.client.get(reverse('catalog'))['ETag']
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        first = self.client.get(reverse('home'))
+        self.assertNotIn('Last-Modified', first)
+        self.assertNotEqual(first['ETag'], anonymous)
+        self.assertEqual(self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        # Adding to the cart queues a message, which must be rendered
+        self.client.post(reverse('add_to_cart', args=[self.drill.id]))
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        # The cart count in the menu changed too
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cart (1)')
+
+    def test_json_listing(self):
+        response = self.revalidate(reverse('api_items'))
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('ETag', response)
+        first = self.client.get(reverse('api_items'))
+        self.drill.delete()
+        response = self.client.get(reverse('api_items'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+
+class StaticAssetTest(TestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(source, 'css'))
+        self.css = b'.card { color: #333; }\n' * 100
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as f:
+            f.write(self.css)
+        settings = override_settings(STATICFILES_DIRS=[source], STATIC_ROOT=self.root, DEBUG=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            self.hashed = json.load(f)['paths']['css/site.css']
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        self.assertRegex(self.hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(self.root, self.hashed + '.gz')))
+        self.assertEqual(assets.staticfiles_storage.url('css/site.css'), '/static/' + self.hashed)
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/static/' + self.hashed, HTTP_ACCEPT_ENCODING='br;q=0, gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], assets.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.css)
+
+        response = self.client.get('/static/' + self.hashed)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), self.css)
+
+        response = self.client.get('/static/' + self.hashed, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_compressed_variant_requested_by_name_is_not_labelled_as_css(self):
+        response = self.client.get('/static/' + self.hashed + '.gz', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.css)
+
+    def test_unhashed_and_missing_files(self):
+        response = self.client.get('/static/css/site.css')
+        self.assertEqual(response['Cache-Control'], assets.REVALIDATE_CACHE_CONTROL)
+        response.close()
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+        self.assertEqual(self.client.get('/static/../settings.py').status_code, 404)
+
+
+class ReferenceCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.reference_cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(reference_cache.reference_cache.clear)
+        self.tools = Category.objects.create(name='Tools')
+        self.drill = Item.objects.create(name='Drill', description='Cordless', category=self.tools,
+                                         daily_rate=Decimal('10.00'), condition='Excellent')
+
+    def test_local_then_shared_tier(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(reference_cache.get('categories'), [{'id': self.tools.id, 'name': 'Tools'}])
+        with self.assertNumQueries(0):
+            reference_cache.get('categories')
+        # Another worker process starts with an empty local tier
+        other = reference_cache.ReferenceCache()
+        with self.assertNumQueries(0):
+            self.assertEqual(other.get('categories'), [{'id': self.tools.id, 'name': 'Tools'}])
+        self.assertEqual(other.stats()['shared_hits'], 1)
+        stats = reference_cache.reference_cache.stats()
+        self.assertEqual((stats['local_hits'], stats['misses']), (1, 1))
+
+    def test_signals_and_bulk_writes_invalidate(self):
+        other = reference_cache.ReferenceCache()
+        reference_cache.warm()
+        other.get('category_summaries')
+        self.tools.name = 'Power tools'
+        self.tools.save()
+        self.assertEqual(other.get('categories')[0]['name'], 'Power tools')
+        Item.objects.create(name='Saw', description='Sharp', category=self.tools,
+                            daily_rate=Decimal('8.00'), condition='Good')
+        self.assertEqual(other.get('category_summaries')[0]['item_count'], 2)
+
+        InventoryImporter().run([(2, {
+            'id': self.drill.id, 'name': 'Drill', 'category': 'Power tools', 'description': 'Cordless',
+            'daily_rate': '10.00', 'condition': 'Good', 'is_available': 'false'
+        })])
+        self.assertEqual([item['name'] for item in other.get('maintenance_items')], ['Saw'])
+
+    def test_maintenance_schedule_items_come_from_cache(self):
+        manager = User.objects.create_user(username='manager', email='manager@example.com', password='password')
+        UserProfile.objects.filter(user=manager).update(role='manager')
+        self.client.force_login(manager)
+        self.client.get(reverse('maintenance_schedule'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('maintenance_schedule'))
+        self.assertContains(response, 'Cordless')
+        self.assertEqual(response.context['available_items'], [
+            {'id': self.drill.id, 'name': 'Drill', 'description_start': 'Cordless'},
+        ])
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "inventory_item"' in query['sql']])
+
+    def test_maintenance_form_choices_come_from_cache(self):
+        reference_cache.warm()
+        with self.assertNumQueries(0):
+            html = str(MaintenanceForm()['item'])
+        self.assertIn(f'<option value="{self.drill.id}">Drill</option>', html)
+        form = MaintenanceForm({'item': self.drill.id, 'maintenance_date': '2999-01-01T10:00', 'description': 'Check'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['item'], self.drill)
+
+
+class WarmCachesTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache.reference_cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(reference_cache.reference_cache.clear)
+        self.tools = Category.objects.create(name='Tools')
+        self.items = [
+            Item.objects.create(name=f'Tool {i}', description='Sharp', category=self.tools,
+                                daily_rate=Decimal('10.00'), condition='Good')
+            for i in range(3)
+        ]
+
+    def test_command_fills_caches(self):
+        out = StringIO()
+        call_command('warm_caches', '--workers', '2', '--days', '30', stdout=out)
+        output = out.getvalue()
+        self.assertIn('availability items 1-3: 3 calendars', output)
+        self.assertIn('report snapshots', output)
+        self.assertRegex(output, r'\d+ jobs in [\d.]+ ms wall clock')
+
+        with self.assertNumQueries(0):
+            reference_cache.get('categories')
+            availability.availability_calendar([item.id for item in self.items], timezone.localdate(), 30)
+        self.assertTrue(DailyCategorySnapshot.objects.filter(day=timezone.localdate()).exists())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_to_warm_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'local to this process'):
+            call_command('warm_caches', stdout=StringIO())
+        out = StringIO()
+        call_command('warm_caches', '--only', 'catalog', 'reports', stdout=out)
+        self.assertIn('catalog category=all', out.getvalue())
+        self.assertIn('report snapshots', out.getvalue())
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_caches', '--days', '0', stdout=StringIO())
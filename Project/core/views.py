@@ -1,138 +1,462 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import logout, get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponseForbidden
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.db import transaction
-from datetime import datetime
-from decimal import Decimal
-from django.views.decorators.http import require_http_methods
-from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Prefetch, Q, Sum
+from django.db.models.functions import Substr
+import asyncio
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from django.views.decorators.http import require_http_methods, require_POST
 
+from inventory import images, importer, search
 from inventory.models import Category, Item, Maintenance
 from reservations.models import Reservation, ReservationItem
+from reservations import availability
+from reservations.services import COMPLETED, BookingConflict, book_items, complete_returns
 from .models import UserProfile
-from .forms import MaintenanceForm
-from .decorators import manager_required, staff_required
+from .forms import InventoryImportForm, MaintenanceForm
+from .decorators import manager_required, staff_or_manager_required, staff_required
+from .pagination import PAGE_SIZE, KnownCountPaginator, akeyset_page, keyset_page
+from . import assets, conditional, exports, reference_cache, reports, roles
+from .roles import is_manager, is_staff_or_manager
 
 User = get_user_model()
 
-# Permission check functions
-def is_staff_or_manager(user):
-    return user.is_authenticated and hasattr(user, 'userprofile') and user.userprofile.role in ['staff', 'manager', 'admin']
+# Upper bound on item ids accepted by the availability endpoint
+MAX_CALENDAR_ITEMS = 100
 
-def is_manager(user):
-    return user.is_authenticated and hasattr(user, 'userprofile') and user.userprofile.role in ['manager', 'admin']
+# Characters of the description shown on an item card
+SUMMARY_LENGTH = 160
 
-def is_admin(user):
-    return user.is_authenticated and hasattr(user, 'userprofile') and user.userprofile.role == 'admin'
+# Longest period the report trends page covers
+MAX_TREND_DAYS = 366
+
+# Session key and size limit of the reservation cart
+CART_SESSION_KEY = 'cart'
+MAX_CART_ITEMS = 20
+
+# Reservations per section page on My Reservations
+RESERVATIONS_PER_PAGE = 10
+
+# Largest batch accepted by the bulk return desk
+MAX_BULK_RETURNS = 200
+
+# Maintenance schedule page size and the statuses records can take
+MAINTENANCE_PER_PAGE = 25
+MAINTENANCE_STATUSES = dict(Maintenance._meta.get_field('status').choices)
 
 # Public views
+def card_items(queryset):
+    # Only the columns an item card renders, with a short description summary
+    return queryset.only(
+        'id', 'name', 'category_id', 'daily_rate', 'condition', 'is_available', 'image', 'image_variants'
+    ).annotate(summary=Substr('description', 1, SUMMARY_LENGTH + 1))
+
+def listing_validators(request, *args, **kwargs):
+    return conditional.page_validators(
+        request, conditional.item_scope(request.GET), request.session.get(CART_SESSION_KEY)
+    )
+
+def catalog_validators(request, *args, **kwargs):
+    # A date-filtered page also changes with the bookings and maintenance in its period
+    try:
+        period = parse_period(request.GET)
+    except ValueError:
+        period = None
+    return conditional.page_validators(
+        request, conditional.item_scope(request.GET), request.session.get(CART_SESSION_KEY),
+        *(conditional.blocking_state(*period) if period else ())
+    )
+
 @login_required
+@conditional.conditional_page(listing_validators)
 def home(request):
     # Display home page with available items
-    categories = Category.objects.all()
-    items = Item.objects.filter(is_available=True)
+    categories = reference_cache.get('categories')
+    items = card_items(Item.objects.filter(is_available=True)).order_by('name', 'id')[:PAGE_SIZE]
     return render(request, 'core/home.html', {
         'categories': categories,
         'items': items
     })
 
+@conditional.conditional_page(catalog_validators)
 def catalog(request):
-    categories = Category.objects.all()
+    categories = reference_cache.get('categories')
     category_id = request.GET.get('category')
+    query = request.GET.get('q', '').strip()
+    period, period_error = None, None
+    try:
+        period = parse_period(request.GET)
+    except ValueError as e:
+        period_error = str(e)
     
-    items = Item.objects.all()
-    if category_id:
-        items = items.filter(category_id=category_id)
+    items = card_items(Item.objects.all())
+    if period:
+        # Only items that could be booked for the whole period
+        items = items.filter(availability.free_during(*period))
+    if query:
+        # Best matches first; search results are capped instead of paginated
+        ids = search.search_item_ids(query, category_id=category_id)
+        items, next_cursor = list(search.ranked(items, ids)), None
+    else:
+        if category_id:
+            items = items.filter(category_id=category_id)
+        items, next_cursor = keyset_page(items, request.GET.get('cursor'))
     
     context = {
         'categories': categories,
         'items': items,
         'selected_category': category_id,
+        'query': query,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'start': request.GET['start'] if period else '',
+        'end': request.GET['end'] if period else '',
+        # Carried over by the category and page links
+        'period_query': urlencode({'start': request.GET['start'], 'end': request.GET['end']}) if period else '',
+        'period_error': period_error,
         'today': timezone.now().date()
     }
     return render(request, 'core/catalog.html', context)
 
+def parse_availability_params(params):
+    # Return (item_ids, start, days), or raise ValueError with a client-facing message
+    try:
+        item_ids = [int(item_id) for item_id in params.get('items', '').split(',') if item_id]
+        start = params.get('start')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else timezone.localdate()
+        days = int(params.get('days', availability.CALENDAR_DAYS))
+    except ValueError:
+        raise ValueError('Invalid parameters.')
+    
+    if not item_ids or len(item_ids) > MAX_CALENDAR_ITEMS:
+        raise ValueError(f'Provide between 1 and {MAX_CALENDAR_ITEMS} item ids.')
+    if not 1 <= days <= availability.CALENDAR_MAX_DAYS:
+        raise ValueError(f'Days must be between 1 and {availability.CALENDAR_MAX_DAYS}.')
+    return item_ids, start, days
+
+def availability_data(start, days, calendars):
+    return {
+        'start': start.isoformat(),
+        'days': days,
+        'items': {str(item_id): bitmap for item_id, bitmap in calendars.items()}
+    }
+
+def item_availability(request):
+    # Per-day availability bitmaps for several items in one round trip
+    try:
+        item_ids, start, days = parse_availability_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    calendars = availability.availability_calendar(item_ids, start, days)
+    return JsonResponse(availability_data(start, days, calendars))
+
+# JSON read API. These views are async so that front-end polling waits on
+# the database without holding a worker thread when served over ASGI.
+# They are not faster per request: every ORM call hops to a thread, and
+# benchmark_handlers against SQLite measures them ~15-25% slower than the
+# sync path for the item list and detail, and on par for availability.
+# The win is concurrency under an ASGI server with a network database.
+def item_data(item):
+    return {
+        'id': item.id,
+        'name': item.name,
+        'category_id': item.category_id,
+        'summary': item.summary[:SUMMARY_LENGTH],
+        'daily_rate': str(item.daily_rate),
+        'condition': item.condition,
+        'is_available': item.is_available,
+        'thumbnail': item.thumbnail
+    }
+
+async def api_items(request):
+    category_id = request.GET.get('category')
+    query = request.GET.get('q', '').strip()
+    if category_id and not category_id.isdigit():
+        return JsonResponse({'error': 'Invalid category.'}, status=400)
+    
+    # The listing is answered from its validators alone when nothing changed
+    etag, last_modified = await conditional.alisting_validators(request, conditional.item_scope(request.GET))
+    response = conditional.not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    
+    items = card_items(Item.objects.all())
+    if query:
+        ids = await sync_to_async(search.search_item_ids)(query, category_id=category_id)
+        rows = [item async for item in search.ranked(items, ids)]
+        count, next_cursor = len(ids), None
+    else:
+        if category_id:
+            items = items.filter(category_id=category_id)
+        # The page and the total are independent queries, so issue them together
+        (rows, next_cursor), count = await asyncio.gather(
+            akeyset_page(items, request.GET.get('cursor')),
+            items.acount()
+        )
+    
+    response = JsonResponse({
+        'count': count,
+        'next_cursor': next_cursor,
+        'items': [item_data(item) for item in rows]
+    })
+    return conditional.add_validators(response, etag, last_modified)
+
+async def api_item_detail(request, item_id):
+    try:
+        item = await Item.objects.select_related('category').aget(id=item_id)
+    except Item.DoesNotExist:
+        return JsonResponse({'error': 'Item not found.'}, status=404)
+    
+    upcoming_maintenance, upcoming_reservations = await asyncio.gather(
+        Maintenance.objects.filter(
+            item_id=item_id,
+            status__in=availability.BLOCKING_MAINTENANCE_STATUSES,
+            maintenance_date__gte=timezone.now()
+        ).aexists(),
+        ReservationItem.objects.filter(
+            item_id=item_id,
+            reservation__status__in=availability.BLOCKING_RESERVATION_STATUSES,
+            reservation__end_date__gte=timezone.now()
+        ).acount()
+    )
+    
+    return JsonResponse({
+        'id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'category': {'id': item.category_id, 'name': item.category.name},
+        'daily_rate': str(item.daily_rate),
+        'condition': item.condition,
+        'is_available': item.is_available,
+        'upcoming_maintenance': upcoming_maintenance,
+        'upcoming_reservations': upcoming_reservations,
+        'reserve_url': reverse('reserve_item', args=[item.id])
+    })
+
+async def api_availability(request):
+    try:
+        item_ids, start, days = parse_availability_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    calendars = await availability.aavailability_calendar(item_ids, start, days)
+    return JsonResponse(availability_data(start, days, calendars))
+
+@require_http_methods(['GET', 'HEAD'])
+def item_image(request, name):
+    # Item images and their variants; names are content hashes, so they never change
+    try:
+        path = images.image_storage.path(f'{images.IMAGE_DIR}/{name}')
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    return assets.file_response(request, path, assets.IMMUTABLE_CACHE_CONTROL)
+
 def logout_view(request):
     logout(request)
     return redirect('home')
 
 # Customer views
+def parse_booking_dates(start_date, end_date):
+    # Return aware (start, end) datetimes, or raise ValueError with a user-facing message
+    if not all([start_date, end_date]):
+        raise ValueError('Please provide both start and end dates.')
+    
+    try:
+        start_date = timezone.make_aware(datetime.strptime(start_date, '%Y-%m-%d'))
+        end_date = timezone.make_aware(datetime.strptime(end_date, '%Y-%m-%d'))
+    except ValueError:
+        raise ValueError('Invalid date format. Please use YYYY-MM-DD.')
+    
+    if start_date.date() < timezone.now().date():
+        raise ValueError('Start date cannot be in the past.')
+    
+    if end_date.date() < start_date.date():
+        raise ValueError('End date must be after start date.')
+    
+    return start_date, end_date
+
+def parse_period(params):
+    # The catalog's start/end filter as aware datetimes, or None when it is not set
+    start_date, end_date = params.get('start'), params.get('end')
+    if not start_date and not end_date:
+        return None
+    return parse_booking_dates(start_date, end_date)
+
 @login_required
 def reserve_item(request, item_id):
     item = get_object_or_404(Item, id=item_id)
     
     if request.method == 'POST':
-        start_date = request.POST.get('start_date')
-        end_date = request.POST.get('end_date')
-        
-        if not all([start_date, end_date]):
-            messages.error(request, 'Please provide both start and end dates.')
+        try:
+            start_date, end_date = parse_booking_dates(
+                request.POST.get('start_date'), request.POST.get('end_date')
+            )
+        except ValueError as e:
+            messages.error(request, str(e))
             return redirect('catalog')
         
         try:
-            start_date = timezone.make_aware(datetime.strptime(start_date, '%Y-%m-%d'))
-            end_date = timezone.make_aware(datetime.strptime(end_date, '%Y-%m-%d'))
-            
-            if start_date.date() < timezone.now().date():
-                messages.error(request, 'Start date cannot be in the past.')
-                return redirect('catalog')
-            
-            if end_date.date() < start_date.date():
-                messages.error(request, 'End date must be after start date.')
-                return redirect('catalog')
-            
-            if Maintenance.objects.filter(
-                item=item,
-                maintenance_date__range=(start_date, end_date),
-                status__in=['SCHEDULED', 'IN_PROGRESS']
-            ).exists():
-                messages.error(request, 'Item is scheduled for maintenance during the selected dates.')
-                return redirect('catalog')
-            
-            if ReservationItem.objects.filter(
-                item=item,
-                reservation__start_date__lte=end_date,
-                reservation__end_date__gte=start_date,
-                reservation__status='active'
-            ).exists():
-                messages.error(request, 'Item is already reserved for the selected dates.')
-                return redirect('catalog')
-            
-            days = (end_date - start_date).days + 1
-            total_cost = item.daily_rate * Decimal(str(days))
-            
-            with transaction.atomic():
-                reservation = Reservation.objects.create(
-                    user=request.user,
-                    start_date=start_date,
-                    end_date=end_date,
-                    status='active',
-                    total_cost=total_cost
-                )
-                
-                ReservationItem.objects.create(
-                    reservation=reservation,
-                    item=item,
-                    price_per_day=item.daily_rate,
-                    subtotal=total_cost
-                )
-            
-            messages.success(request, f'Successfully reserved {item.name}')
-            return redirect('my_reservations')
-            
-        except ValueError:
-            messages.error(request, 'Invalid date format. Please use YYYY-MM-DD.')
+            book_items(request.user, [item], start_date, end_date)
+        except BookingConflict as conflict:
+            for error in conflict.conflicts:
+                messages.error(request, error['message'])
             return redirect('catalog')
+        
+        messages.success(request, f'Successfully reserved {item.name}')
+        return redirect('my_reservations')
     
     return redirect('catalog')
 
+# Cart: item ids kept in the session until checkout books them together
+@login_required
+def view_cart(request):
+    items = card_items(Item.objects.filter(id__in=request.session.get(CART_SESSION_KEY, []))).order_by('name', 'id')
+    return render(request, 'core/cart.html', {
+        'items': items,
+        'daily_total': sum(item.daily_rate for item in items),
+        'today': timezone.now().date()
+    })
+
+@login_required
+@require_POST
+def add_to_cart(request, item_id):
+    item = get_object_or_404(Item.objects.only('id', 'name'), id=item_id)
+    cart = request.session.get(CART_SESSION_KEY, [])
+    
+    if item.id in cart:
+        messages.info(request, f'{item.name} is already in your cart.')
+    elif len(cart) >= MAX_CART_ITEMS:
+        messages.error(request, f'Your cart can hold at most {MAX_CART_ITEMS} items.')
+    else:
+        request.session[CART_SESSION_KEY] = cart + [item.id]
+        messages.success(request, f'{item.name} added to your cart.')
+    return redirect('catalog')
+
+@login_required
+@require_POST
+def remove_from_cart(request, item_id):
+    cart = request.session.get(CART_SESSION_KEY, [])
+    request.session[CART_SESSION_KEY] = [cart_item for cart_item in cart if cart_item != item_id]
+    return redirect('cart')
+
+@login_required
+@require_POST
+def checkout(request):
+    try:
+        item_ids = [int(item_id) for item_id in request.POST.getlist('item_ids')]
+    except ValueError:
+        item_ids = []
+    item_ids = item_ids or request.session.get(CART_SESSION_KEY, [])
+    
+    if not item_ids:
+        messages.error(request, 'Your cart is empty.')
+        return redirect('cart')
+    if len(item_ids) > MAX_CART_ITEMS:
+        messages.error(request, f'You can reserve at most {MAX_CART_ITEMS} items at once.')
+        return redirect('cart')
+    
+    try:
+        start_date, end_date = parse_booking_dates(
+            request.POST.get('start_date'), request.POST.get('end_date')
+        )
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('cart')
+    
+    items = list(Item.objects.filter(id__in=item_ids).only('id', 'name', 'daily_rate'))
+    if not items:
+        messages.error(request, 'None of the selected items exist.')
+        return redirect('cart')
+    
+    try:
+        reservation = book_items(request.user, items, start_date, end_date)
+    except BookingConflict as conflict:
+        for error in conflict.conflicts:
+            messages.error(request, error['message'])
+        return redirect('cart')
+    
+    request.session[CART_SESSION_KEY] = []
+    messages.success(request, f'Successfully reserved {len(items)} items (reservation #{reservation.id}).')
+    return redirect('my_reservations')
+
+def reservation_page_data(page):
+    return {
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'results': [{
+            'id': reservation.id,
+            'status': reservation.status,
+            'start_date': reservation.start_date.isoformat(),
+            'end_date': reservation.end_date.isoformat(),
+            'total_cost': str(reservation.total_cost),
+            'items': [{
+                'item_id': reservation_item.item.id,
+                'name': reservation_item.item.name,
+                'description': reservation_item.item.description,
+                'quantity': reservation_item.quantity,
+                'price_per_day': str(reservation_item.price_per_day),
+                'subtotal': str(reservation_item.subtotal)
+            } for reservation_item in reservation.items.all()]
+        } for reservation in page]
+    }
+
 @login_required
 def my_reservations(request):
-    reservations = Reservation.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'core/my_reservations.html', {'reservations': reservations})
+    reservations = Reservation.objects.filter(user=request.user).only(
+        'id', 'status', 'start_date', 'end_date', 'total_cost', 'created_at'
+    ).prefetch_related(Prefetch(
+        'items',
+        queryset=ReservationItem.objects.select_related('item').only(
+            'id', 'reservation_id', 'quantity', 'price_per_day', 'subtotal',
+            'item__id', 'item__name', 'item__description'
+        )
+    )).order_by('-created_at', '-id')
+    
+    # One summary query supplies both section totals, so the paginators skip COUNT(*)
+    summary = Reservation.objects.filter(user=request.user).aggregate(
+        active_count=Count('id', filter=~Q(status='cancelled')),
+        cancelled_count=Count('id', filter=Q(status='cancelled')),
+        total_spent=Sum('total_cost', filter=~Q(status='cancelled'))
+    )
+    
+    active_page = KnownCountPaginator(
+        reservations.exclude(status='cancelled'), RESERVATIONS_PER_PAGE, summary['active_count']
+    ).get_page(request.GET.get('active_page'))
+    cancelled_page = KnownCountPaginator(
+        reservations.filter(status='cancelled'), RESERVATIONS_PER_PAGE, summary['cancelled_count']
+    ).get_page(request.GET.get('cancelled_page'))
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'summary': {
+                'active_count': summary['active_count'],
+                'cancelled_count': summary['cancelled_count'],
+                'total_spent': str(summary['total_spent'] or 0)
+            },
+            'active': reservation_page_data(active_page),
+            'cancelled': reservation_page_data(cancelled_page)
+        })
+    
+    return render(request, 'core/my_reservations.html', {
+        'summary': summary,
+        'active_page': active_page,
+        'cancelled_page': cancelled_page
+    })
 
 @login_required
 def cancel_reservation(request, reservation_id):
@@ -156,15 +480,11 @@ def process_return(request, reservation_id):
     if request.method == 'POST':
         status = request.POST.get('status')
         if status == 'completed':
-            reservation.status = 'completed'
-            reservation.save()
-            
-            for reservation_item in reservation.items.all():
-                item = reservation_item.item
-                item.is_available = True
-                item.save()
-            
-            messages.success(request, 'Equipment return processed successfully.')
+            outcome = complete_returns([reservation.id])[0]
+            if outcome['outcome'] == COMPLETED:
+                messages.success(request, 'Equipment return processed successfully.')
+            else:
+                messages.warning(request, f"Return #{reservation.id} not processed: {outcome['detail']}")
         return redirect('manage_returns')
     
     return render(request, 'core/process_return.html', {'reservation': reservation})
@@ -172,15 +492,63 @@ def process_return(request, reservation_id):
 @login_required
 @user_passes_test(is_staff_or_manager, login_url=None, redirect_field_name=None)
 def manage_returns(request):
+    # Overdue status is maintained by the reservation lifecycle engine
     active_returns = Reservation.objects.filter(
-        status='pending',
-        end_date__lte=timezone.now()
+        status='overdue'
+    ).select_related('user').prefetch_related(
+        Prefetch('items', queryset=ReservationItem.objects.select_related('item'))
     ).order_by('-end_date')
     
     return render(request, 'core/manage_returns.html', {
         'active_returns': active_returns
     })
 
+def parse_reservation_ids(request):
+    # Ids from a JSON body {"reservation_ids": [...]} or repeated form fields
+    if request.content_type == 'application/json':
+        try:
+            ids = json.loads(request.body).get('reservation_ids', [])
+        except (ValueError, AttributeError):
+            raise ValueError('Invalid JSON body.')
+        if not isinstance(ids, list):
+            raise ValueError('reservation_ids must be a list.')
+    else:
+        ids = request.POST.getlist('reservation_ids')
+    try:
+        ids = [int(reservation_id) for reservation_id in ids]
+    except (TypeError, ValueError):
+        raise ValueError('Reservation ids must be integers.')
+    if not ids:
+        raise ValueError('Select at least one reservation.')
+    if len(ids) > MAX_BULK_RETURNS:
+        raise ValueError(f'At most {MAX_BULK_RETURNS} returns can be processed at once.')
+    return ids
+
+@login_required
+@user_passes_test(is_staff_or_manager, login_url=None, redirect_field_name=None)
+@require_POST
+def bulk_process_returns(request):
+    wants_json = request.content_type == 'application/json' or request.GET.get('format') == 'json'
+    try:
+        reservation_ids = parse_reservation_ids(request)
+    except ValueError as e:
+        if wants_json:
+            return JsonResponse({'error': str(e)}, status=400)
+        messages.error(request, str(e))
+        return redirect('manage_returns')
+
+    outcomes = complete_returns(reservation_ids)
+    completed = sum(1 for outcome in outcomes if outcome['outcome'] == COMPLETED)
+    if wants_json:
+        return JsonResponse({'completed': completed, 'results': outcomes})
+
+    if completed:
+        messages.success(request, f'{completed} return(s) processed successfully.')
+    for outcome in outcomes:
+        if outcome['outcome'] != COMPLETED:
+            messages.warning(request, f"Return #{outcome['reservation_id']} not processed: {outcome['detail']}")
+    return redirect('manage_returns')
+
 @manager_required
 def schedule_maintenance(request, item_id=None):
     if item_id:
@@ -208,12 +576,32 @@ def schedule_maintenance(request, item_id=None):
         'item': item
     })
 
-def staff_or_manager_required(view_func):
-    def _wrapped_view(request, *args, **kwargs):
-        if not is_staff_or_manager(request.user):
-            raise PermissionDenied
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
+def maintenance_filters(params):
+    # Validated schedule filters from the query string; invalid values are dropped
+    filters = {}
+    if params.get('status') in MAINTENANCE_STATUSES:
+        filters['status'] = params['status']
+    if params.get('item', '').isdigit():
+        filters['item_id'] = int(params['item'])
+    for name, lookup in (('date_from', 'maintenance_date__date__gte'), ('date_to', 'maintenance_date__date__lte')):
+        try:
+            filters[lookup] = datetime.strptime(params.get(name, ''), '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    return filters
+
+def maintenance_schedule(filters):
+    # One page's worth of records in schedule order
+    return Maintenance.objects.filter(**filters).select_related('item', 'staff').order_by('maintenance_date', 'id')
+
+def update_maintenance_status(maintenance_ids, status):
+    # One UPDATE for any number of records; returns how many changed
+    records = Maintenance.objects.filter(id__in=maintenance_ids).exclude(status=status)
+    item_ids = list(records.values_list('item_id', flat=True))
+    updated = records.update(status=status, updated_at=timezone.now())
+    # QuerySet.update sends no signals, and the status decides whether an item is blocked
+    availability.invalidate_items(item_ids)
+    return updated
 
 @login_required
 @staff_or_manager_required
@@ -221,51 +609,60 @@ def staff_or_manager_required(view_func):
 def view_maintenance_schedule(request):
     if request.method == 'POST':
         action = request.POST.get('action')
-        maintenance_id = request.POST.get('maintenance_id')
-        
-        if action == 'update_status' and maintenance_id:
-            try:
-                maintenance = Maintenance.objects.get(id=maintenance_id)
-                new_status = request.POST.get('status')
-                if new_status in ['SCHEDULED', 'IN_PROGRESS', 'COMPLETED']:
-                    maintenance.status = new_status
-                    maintenance.save()
-                    messages.success(request, f'Maintenance status updated to {new_status}.')
-            except Maintenance.DoesNotExist:
-                messages.error(request, 'Maintenance record not found.')
+        if action in ('update_status', 'cancel'):
+            maintenance_ids = request.POST.getlist('maintenance_id')
+        else:
+            maintenance_ids = request.POST.getlist('maintenance_ids')
+        new_status = 'CANCELLED' if action == 'cancel' else request.POST.get('status')
         
-        return redirect('maintenance_schedule')
-    
-    maintenance_list = Maintenance.objects.all().order_by('maintenance_date')
-    # Get all items that are available for maintenance
-    available_items = Item.objects.filter(is_available=True).order_by('name')
-    
-    # Check if user is a manager through their profile
-    is_manager = request.user.userprofile.role == 'manager'
-    
-    # If user is a manager, calculate analytics
-    if is_manager:
-        total_records = maintenance_list.count()
-        pending_count = maintenance_list.filter(status='pending').count()
-        in_progress_count = maintenance_list.filter(status='in_progress').count()
-        completed_count = maintenance_list.filter(status='completed').count()
-        completion_rate = (completed_count / total_records * 100) if total_records > 0 else 0
+        if action not in ('update_status', 'cancel', 'bulk_update_status'):
+            messages.error(request, 'Unknown action.')
+        elif not maintenance_ids or not all(value.isdigit() for value in maintenance_ids):
+            messages.error(request, 'Select at least one maintenance record.')
+        elif new_status not in MAINTENANCE_STATUSES:
+            messages.error(request, 'Invalid maintenance status.')
+        else:
+            with transaction.atomic():
+                updated = update_maintenance_status(maintenance_ids, new_status)
+            messages.success(request, f'{updated} maintenance record(s) updated to {MAINTENANCE_STATUSES[new_status]}.')
         
-        analytics = {
-            'total_records': total_records,
-            'pending_count': pending_count,
-            'in_progress_count': in_progress_count,
-            'completed_count': completed_count,
-            'completion_rate': completion_rate
-        }
-    else:
-        analytics = None
+        # Return to the same filtered page
+        return redirect(request.get_full_path())
+    
+    filters = maintenance_filters(request.GET)
+    maintenance_list = Maintenance.objects.filter(**filters)
+    
+    # Every figure from one aggregate; the total also feeds the paginator
+    analytics = maintenance_list.aggregate(
+        total_records=Count('id'),
+        scheduled_count=Count('id', filter=Q(status='SCHEDULED')),
+        in_progress_count=Count('id', filter=Q(status='IN_PROGRESS')),
+        completed_count=Count('id', filter=Q(status='COMPLETED')),
+        cancelled_count=Count('id', filter=Q(status='CANCELLED'))
+    )
+    total_records = analytics['total_records']
+    analytics['completion_rate'] = (analytics['completed_count'] / total_records * 100) if total_records > 0 else 0
+    
+    page = KnownCountPaginator(
+        maintenance_schedule(filters),
+        MAINTENANCE_PER_PAGE,
+        total_records
+    ).get_page(request.GET.get('page'))
+    
+    # Check if user is a manager through their role
+    is_manager = roles.get_role(request.user) == roles.MANAGER
+    
+    # Items available for maintenance, from the reference cache
+    available_items = reference_cache.get('maintenance_item_cards') if is_manager else []
     
     return render(request, 'core/maintenance_schedule.html', {
-        'maintenance_records': maintenance_list,
+        'maintenance_records': page,
         'available_items': available_items,
+        'filter_items': reference_cache.get('item_names'),
+        'statuses': MAINTENANCE_STATUSES.items(),
+        'filters': request.GET,
         'is_manager': is_manager,
-        'analytics': analytics
+        'analytics': analytics if is_manager else None
     })
 
 # Manager views
@@ -273,7 +670,6 @@ def view_maintenance_schedule(request):
 @user_passes_test(is_manager, login_url=None, redirect_field_name=None)
 def manage_inventory(request):
     items = Item.objects.all().order_by('category', 'name')
-    categories = Category.objects.all()
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -291,6 +687,9 @@ def manage_inventory(request):
                     return redirect('manage_inventory')
                 
                 category = get_object_or_404(Category, id=category_id)
+                image = request.FILES.get('image')
+                if image:
+                    images.validate_upload(image)
                 
                 Item.objects.create(
                     name=name,
@@ -298,7 +697,8 @@ def manage_inventory(request):
                     daily_rate=daily_rate,
                     description=description,
                     condition=condition,
-                    is_available=True
+                    is_available=True,
+                    image=image or ''
                 )
                 messages.success(request, f'Item "{name}" added successfully.')
             except Exception as e:
@@ -327,6 +727,12 @@ def manage_inventory(request):
                 item.daily_rate = daily_rate
                 item.description = description
                 item.condition = condition
+                image = request.FILES.get('image')
+                if image:
+                    images.validate_upload(image)
+                    item.image = image
+                elif request.POST.get('remove_image'):
+                    item.image = ''
                 item.save()
                 
                 messages.success(request, f'Item "{name}" updated successfully.')
@@ -348,14 +754,45 @@ def manage_inventory(request):
     
     return render(request, 'core/manage_inventory.html', {
         'items': items,
-        'categories': categories
+        'categories': reference_cache.get('categories')
     })
 
 @login_required
 @user_passes_test(is_manager, login_url=None, redirect_field_name=None)
-def manage_categories(request):
-    categories = Category.objects.all()
+def import_inventory(request):
+    counts, rejects = None, []
+    if request.method == 'POST':
+        form = InventoryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            file_format = form.cleaned_data['file_format'] or importer.detect_format(upload.name)
+            # Stream the upload row by row; only the first rejects are kept for display
+            run = importer.InventoryImporter()
+            try:
+                counts = run.run(importer.read_rows(
+                    io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), file_format
+                ))
+            except UnicodeDecodeError:
+                messages.error(request, 'The file must be UTF-8 encoded.')
+            else:
+                rejects = run.reported
+                messages.success(
+                    request,
+                    f"Created {counts['created']} and updated {counts['updated']} items; "
+                    f"{counts['rejected']} rows rejected."
+                )
+    else:
+        form = InventoryImportForm()
     
+    return render(request, 'core/import_inventory.html', {
+        'form': form,
+        'counts': counts,
+        'rejects': rejects
+    })
+
+@login_required
+@user_passes_test(is_manager, login_url=None, redirect_field_name=None)
+def manage_categories(request):
     if request.method == 'POST':
         action = request.POST.get('action')
         
@@ -388,15 +825,16 @@ def manage_categories(request):
             except Category.DoesNotExist:
                 messages.error(request, 'Category not found.')
     
+    # Read after any change above, so the list already includes it
     return render(request, 'core/manage_categories.html', {
-        'categories': categories
+        'categories': reference_cache.get('category_summaries')
     })
 
 @login_required
 @user_passes_test(is_manager)
 def manage_staff(request):
-    is_admin_user = request.user.userprofile.role == 'admin'
-    is_manager_user = request.user.userprofile.role == 'manager'
+    is_admin_user = roles.get_role(request.user) == roles.ADMIN
+    is_manager_user = roles.get_role(request.user) == roles.MANAGER
 
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -520,52 +958,82 @@ def manage_staff(request):
 def generate_reports(request):
     if not is_manager(request.user):
         return HttpResponseForbidden('You do not have permission to access this page.')
-        
-    items = Item.objects.all()
-    total_items = items.count()
-    available_items = items.filter(is_available=True).count()
-    active_reservations = Reservation.objects.filter(status='active').count()
-    
-    in_maintenance = Item.objects.filter(
-        maintenance_records__status__in=['pending', 'in_progress'],
-        maintenance_records__maintenance_date__date=timezone.now().date()
-    ).distinct().count()
-    
-    pending_returns = Reservation.objects.filter(
-        status='active',
-        end_date__lte=timezone.now().date()
-    ).count()
-    
-    categories = Category.objects.all()
-    category_stats = []
-    
-    for category in categories:
-        cat_items = items.filter(category=category)
-        total = cat_items.count()
-        available = cat_items.filter(is_available=True).count()
-        in_use = cat_items.filter(
-            reservationitem__reservation__status='active',
-            reservationitem__reservation__start_date__lte=timezone.now().date(),
-            reservationitem__reservation__end_date__gte=timezone.now().date()
-        ).distinct().count()
-        in_maintenance = cat_items.filter(
-            maintenance_records__status__in=['pending', 'in_progress'],
-            maintenance_records__maintenance_date__date=timezone.now().date()
-        ).distinct().count()
-        
-        category_stats.append({
-            'name': category.name,
-            'total': total,
-            'available': available,
-            'in_use': in_use,
-            'in_maintenance': in_maintenance
-        })
+    
+    today = timezone.localdate()
+    
+    # Read today's rollup when build_report_snapshots has produced one
+    category_stats, computed_at = reports.snapshot_category_stats(today)
+    if category_stats is None:
+        category_stats = reports.live_category_stats(today)
+    
+    # Every item belongs to exactly one category, so the totals are plain sums
+    total_items = sum(stats['total_items'] for stats in category_stats)
+    available_items = sum(stats['available'] for stats in category_stats)
+    in_maintenance = sum(stats['in_maintenance'] for stats in category_stats)
+    
+    # Started bookings the lifecycle job has not activated yet count as active
+    started = Q(status='active') | Q(status='confirmed', start_date__lte=timezone.now())
+    reservation_counts = Reservation.objects.aggregate(
+        active_reservations=Count('id', filter=started),
+        pending_returns=Count('id', filter=Q(status='overdue'))
+    )
     
     return render(request, 'core/reports.html', {
         'total_items': total_items,
         'available_items': available_items,
-        'active_reservations': active_reservations,
+        'active_reservations': reservation_counts['active_reservations'],
         'in_maintenance': in_maintenance,
-        'pending_returns': pending_returns,
-        'category_stats': category_stats
+        'maintenance_items': in_maintenance,
+        'pending_returns': reservation_counts['pending_returns'],
+        'category_stats': category_stats,
+        'computed_at': computed_at
+    })
+
+@login_required
+def export_data(request, dataset):
+    if not is_manager(request.user):
+        return HttpResponseForbidden('You do not have permission to access this page.')
+    
+    file_format = request.GET.get('format', 'csv')
+    try:
+        if file_format not in exports.FORMATS:
+            raise exports.ExportError(f"Format must be one of: {', '.join(exports.FORMATS)}.")
+        headers, rows = exports.export_rows(
+            dataset,
+            start=exports.parse_date(request.GET.get('start'), 'start'),
+            end=exports.parse_date(request.GET.get('end'), 'end'),
+            status=request.GET.get('status')
+        )
+    except exports.ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    response = StreamingHttpResponse(
+        exports.encode(headers, rows, file_format),
+        content_type=exports.CONTENT_TYPES[file_format]
+    )
+    filename = f'{dataset}-{timezone.localdate().isoformat()}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+def cache_stats(request):
+    # Hit and miss counters of this worker process's reference cache
+    if not is_manager(request.user):
+        return HttpResponseForbidden('You do not have permission to access this page.')
+    return JsonResponse({'reference_cache': reference_cache.reference_cache.stats()})
+
+@login_required
+def report_trends(request):
+    if not is_manager(request.user):
+        return HttpResponseForbidden('You do not have permission to access this page.')
+    
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), MAX_TREND_DAYS)
+    except ValueError:
+        days = 30
+    
+    today = timezone.localdate()
+    return render(request, 'core/report_trends.html', {
+        'days': days,
+        'trends': reports.daily_trends(today - timedelta(days=days - 1), today)
     })
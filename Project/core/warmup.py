@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from inventory.models import Category, Item
+from reservations import availability
+from . import reference_cache, reports
+from .pagination import keyset_page
+
+logger = logging.getLogger(__name__)
+
+# Cache warm-up after a deploy.
+# Each task expands into small independent jobs (one dataset, one catalog
+# page, one chunk of availability calendars) run on a thread pool, so the
+# first real requests find the caches and the database pages already hot.
+# The catalog pages are not cached anywhere; that task only reads them so
+# their rows and indexes are in the database's page cache.
+# Per-process tiers (the reference cache's LRU, a local-memory cache
+# backend) only benefit the process that warms them: run the warm_caches
+# command for the shared cache and the database, and WARM_CACHES_ON_STARTUP
+# for every worker. The command needs a cache backend shared with the
+# workers (see CACHES in settings); with a process-local one everything it
+# fills is discarded when it exits, so it refuses to run the cache tasks.
+
+TASKS = ('reference', 'catalog', 'availability', 'reports')
+# Report snapshots are written to the database, which every booting worker
+# doing at once would only contend on
+STARTUP_TASKS = ('reference', 'catalog', 'availability')
+WORKERS = 4
+# Tasks whose results live in the cache rather than the database
+CACHE_TASKS = ('reference', 'availability')
+
+
+def _reference_job(name):
+    return f'{len(reference_cache.get(name))} rows'
+
+
+def _catalog_job(category_id):
+    # Same query as the first catalog page
+    from .views import card_items
+
+    items = card_items(Item.objects.all())
+    if category_id is not None:
+        items = items.filter(category_id=category_id)
+    rows, _ = keyset_page(items)
+    return f'{len(rows)} items'
+
+
+def _availability_job(item_ids, start, days):
+    return f'{len(availability.availability_calendar(item_ids, start, days))} calendars'
+
+
+def _reports_job():
+    days = reports.touched_days(reports.last_computed_at(), timezone.localdate())
+    return f'{reports.build_snapshots(days)} snapshot rows'
+
+
+def plan(tasks=TASKS, days=availability.CALENDAR_DAYS):
+    # Return [(name, job)] for the requested tasks
+    jobs = []
+    if 'reference' in tasks:
+        jobs += [(f'reference {name}', partial(_reference_job, name)) for name in reference_cache.DATASETS]
+    if 'catalog' in tasks:
+        category_ids = [None] + list(Category.objects.values_list('id', flat=True))
+        jobs += [(f'catalog category={category_id or "all"}', partial(_catalog_job, category_id))
+                 for category_id in category_ids]
+    if 'availability' in tasks:
+        # Same start and length as the catalog's own calendar requests, so the keys match
+        start = timezone.localdate()
+        item_ids = list(Item.objects.order_by('name', 'id').values_list('id', flat=True))
+        size = availability.CALENDAR_CHUNK_SIZE
+        for offset in range(0, len(item_ids), size):
+            chunk = item_ids[offset:offset + size]
+            jobs.append((f'availability items {offset + 1}-{offset + len(chunk)}',
+                         partial(_availability_job, chunk, start, days)))
+    if 'reports' in tasks:
+        jobs.append(('report snapshots', _reports_job))
+    return jobs
+
+
+def _timed(job):
+    started = time.perf_counter()
+    try:
+        return job(), time.perf_counter() - started
+    finally:
+        # Pool threads open their own connections; do not leave them behind
+        connections.close_all()
+
+
+def warm(tasks=TASKS, days=availability.CALENDAR_DAYS, workers=WORKERS):
+    # Run the jobs; returns ([(name, detail, seconds or None if it failed)], total seconds)
+    started = time.perf_counter()
+    jobs = plan(tasks, days)
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='warm-caches') as pool:
+        futures = [(name, pool.submit(_timed, job)) for name, job in jobs]
+        for name, future in futures:
+            try:
+                detail, seconds = future.result()
+            except Exception as e:
+                logger.warning('Warm-up job %s failed', name, exc_info=True)
+                detail, seconds = f'failed: {e}', None
+            results.append((name, detail, seconds))
+    return results, time.perf_counter() - started
+
+
+def summary(results, total):
+    # One line per job, then the totals
+    lines = [
+        f'{name}: {detail}' + (f' ({seconds * 1000:.1f} ms)' if seconds is not None else '')
+        for name, detail, seconds in results
+    ]
+    failed = sum(1 for _, _, seconds in results if seconds is None)
+    job_time = sum(seconds for _, _, seconds in results if seconds is not None)
+    lines.append(
+        f'{len(results)} jobs in {total * 1000:.1f} ms wall clock, {job_time * 1000:.1f} ms of work'
+        + (f', {failed} failed' if failed else '')
+    )
+    return lines
+
+
+def warm_on_startup():
+    # Called from CoreConfig.ready(); warms in the background once every app is ready
+    def run():
+        apps.ready_event.wait()
+        try:
+            results, total = warm(getattr(settings, 'WARM_CACHES_TASKS', STARTUP_TASKS))
+        except Exception:
+            # Also runs for management commands, e.g. before migrate has created the tables
+            logger.warning('Warm-up on startup failed', exc_info=True)
+            return
+        finally:
+            connections.close_all()
+        for line in summary(results, total):
+            logger.info('Warm-up %s', line)
+
+    threading.Thread(target=run, name='warm-caches', daemon=True).start()
+
+
+def log_startup(server, started):
+    # Report how long the worker took to build its application
+    logger.info('%s worker ready in %.1f ms', server, (time.perf_counter() - started) * 1000)
@@ -8,9 +8,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'equipment_rental.settings')
 
+started = time.perf_counter()
 application = get_asgi_application()
+
+from core.warmup import log_startup  # noqa: E402
+
+log_startup('ASGI', started)
@@ -10,6 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import atexit
+import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,10 +56,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.assets.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.roles.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,6 +79,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.roles.roles',
             ],
         },
     },
@@ -131,6 +139,16 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes hashed and precompressed files; core.assets serves them
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -163,3 +181,48 @@ CSRF_HEADER_NAME = 'HTTP_X_CSRFTOKEN'
 # Session Settings
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
+
+# Cache shared by every worker process on this host. The version tokens in
+# core/cache_versions.py only invalidate other workers' copies through a
+# shared backend; process-local backends (LocMemCache, DummyCache) disable
+# them. Point CACHE_DIR at a common directory, or swap in Redis or the
+# database backend when workers run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+if sys.argv[1:2] == ['test']:
+    # Test databases are recreated each run; their cache must be as well
+    CACHES['default']['LOCATION'] = tempfile.mkdtemp(prefix='equipment_rental_cache_')
+    atexit.register(shutil.rmtree, CACHES['default']['LOCATION'], True)
+
+# Reservation statuses are moved on by run_reservation_lifecycle, which must
+# run on a schedule (see Scheduled Jobs in the README). Without it future
+# bookings stay 'confirmed' and late returns never become 'overdue'. Set to
+# True to have it treat overdue rentals as returned.
+RESERVATION_AUTO_COMPLETE = False
+
+# Warm the reference cache, catalog pages and availability calendars in the
+# background when a worker boots (see core/warmup.py and warm_caches)
+WARM_CACHES_ON_STARTUP = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
@@ -19,10 +19,12 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 from core.views import (
-    home, catalog, reserve_item, my_reservations, cancel_reservation,
-    manage_inventory, manage_categories, manage_staff, manage_returns,
-    process_return, schedule_maintenance, view_maintenance_schedule,
-    generate_reports, logout_view
+    home, catalog, item_availability, reserve_item, my_reservations, cancel_reservation,
+    api_items, api_item_detail, api_availability, item_image,
+    view_cart, add_to_cart, remove_from_cart, checkout,
+    manage_inventory, import_inventory, manage_categories, manage_staff, manage_returns,
+    process_return, bulk_process_returns, schedule_maintenance, view_maintenance_schedule,
+    generate_reports, report_trends, export_data, cache_stats, logout_view
 )
 from users.views import login_view
 
@@ -33,18 +35,33 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', home, name='home'),
     path('catalog/', catalog, name='catalog'),
+    path('availability/', item_availability, name='item_availability'),
+    path('api/items/', api_items, name='api_items'),
+    path('api/items/<int:item_id>/', api_item_detail, name='api_item_detail'),
+    path('api/availability/', api_availability, name='api_availability'),
     path('reserve/<int:item_id>/', reserve_item, name='reserve_item'),
+    path('cart/', view_cart, name='cart'),
+    path('cart/add/<int:item_id>/', add_to_cart, name='add_to_cart'),
+    path('cart/remove/<int:item_id>/', remove_from_cart, name='remove_from_cart'),
+    path('cart/checkout/', checkout, name='checkout'),
     path('my-reservations/', my_reservations, name='my_reservations'),
     path('cancel-reservation/<int:reservation_id>/', cancel_reservation, name='cancel_reservation'),
     path('inventory/', manage_inventory, name='manage_inventory'),
+    path('inventory/import/', import_inventory, name='import_inventory'),
     path('categories/', manage_categories, name='manage_categories'),
     path('staff/', manage_staff, name='manage_staff'),
     path('returns/', manage_returns, name='manage_returns'),
     path('process-return/<int:reservation_id>/', process_return, name='process_return'),
+    path('returns/bulk/', bulk_process_returns, name='bulk_process_returns'),
     path('maintenance/schedule/', view_maintenance_schedule, name='maintenance_schedule'),
     path('maintenance/schedule/new/', schedule_maintenance, name='schedule_maintenance_new'),
     path('maintenance/schedule/<int:item_id>/', schedule_maintenance, name='schedule_maintenance_item'),
     path('reports/', generate_reports, name='reports'),
+    path('reports/trends/', report_trends, name='report_trends'),
+    path('reports/export/<slug:dataset>/', export_data, name='export_data'),
+    path('reports/cache-stats/', cache_stats, name='cache_stats'),
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
+    # Content-addressed item images, served with far-future cache headers
+    path(f"{settings.MEDIA_URL.lstrip('/')}images/<path:name>", item_image, name='item_image'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
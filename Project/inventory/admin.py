@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, Item, Maintenance
+from . import search
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -12,6 +13,12 @@ class ItemAdmin(admin.ModelAdmin):
     list_filter = ('category', 'condition', 'is_available')
     search_fields = ('name', 'description')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE '%term%' table scans
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+
 @admin.register(Maintenance)
 class MaintenanceAdmin(admin.ModelAdmin):
     list_display = ('item', 'staff', 'maintenance_date', 'status', 'created_at')
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import posixpath
+from io import BytesIO
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+# Item images.
+# Uploads are stored under the SHA-256 of their content, so a name never
+# changes meaning: identical uploads share one file and every URL can be
+# cached forever. Resized variants are written next to them under the source
+# hash and VARIANTS_VERSION, so a new source or a new variant spec gets new
+# names and nothing else is ever regenerated. This module only deals with
+# files; inventory.thumbnails runs it off the request path and records the
+# results on the item. Resizing needs Pillow, which is optional.
+
+IMAGE_DIR = 'images'
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# Bump when VARIANTS or the encoder settings change
+VARIANTS_VERSION = 1
+# name: bounding box in pixels
+VARIANTS = {
+    'thumb': (480, 360),
+    'large': (1200, 900),
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+# Leading bytes of the formats we accept, and the extension they are stored with
+SIGNATURES = [
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+
+class ImageError(ValueError):
+    pass
+
+
+def resizing_available():
+    return Image is not None
+
+
+def sniff_extension(head):
+    # The extension for an image's first bytes, or None if it is not one we accept
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+
+def validate_upload(upload):
+    # Reject anything that is not a reasonably sized JPEG, PNG, GIF or WebP
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise ImageError(f'Images must be smaller than {MAX_UPLOAD_SIZE // (1024 * 1024)} MB.')
+    upload.seek(0)
+    head = upload.read(16)
+    upload.seek(0)
+    if sniff_extension(head) is None:
+        raise ImageError('Upload a JPEG, PNG, GIF or WebP image.')
+
+
+def source_hash(name):
+    # The content hash a stored image name was built from
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def current_variants(name, recorded):
+    # The recorded variants if they were built from `name` with the current spec
+    if name and recorded.get('source') == name and recorded.get('version') == VARIANTS_VERSION:
+        return recorded.get('files') or None
+    return None
+
+
+def variant_dir(name):
+    return posixpath.join(IMAGE_DIR, 'variants', source_hash(name), f'v{VARIANTS_VERSION}')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # MEDIA_ROOT storage that names every file after the hash of its content
+
+    def content_name(self, content, original_name):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        head = content.read(16)
+        content.seek(0)
+        extension = sniff_extension(head) or os.path.splitext(original_name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return posixpath.join(IMAGE_DIR, hexdigest[:2], hexdigest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Names are decided by the content in _save(); never add a suffix
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(content, name)
+        if self.exists(name):
+            # Same bytes, same file
+            return name
+        return super()._save(name, content)
+
+
+image_storage = ContentAddressedStorage()
+
+
+def _encode(image, image_format, quality):
+    buffer = BytesIO()
+    options = {'quality': quality}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=6)
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(root, name):
+    # Write every variant of the stored image `name` under `root` (MEDIA_ROOT).
+    # Returns {variant: {'jpeg': name, 'webp': name, 'width': w, 'height': h}}.
+    # Takes and returns plain values so it can run in a worker process.
+    if Image is None:
+        raise ImageError('Pillow is not installed.')
+    directory = variant_dir(name)
+    os.makedirs(os.path.join(root, directory), exist_ok=True)
+    with Image.open(os.path.join(root, name)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'L'):
+            source = source.convert('RGBA')
+            background = Image.new('RGB', source.size, (255, 255, 255))
+            background.paste(source, mask=source.getchannel('A'))
+            source = background
+        else:
+            source = source.convert('RGB')
+        variants = {}
+        for variant, size in VARIANTS.items():
+            image = source.copy()
+            image.thumbnail(size, Image.LANCZOS)
+            files = {}
+            for key, image_format, extension, quality in (
+                ('jpeg', 'JPEG', '.jpg', JPEG_QUALITY),
+                ('webp', 'WEBP', '.webp', WEBP_QUALITY),
+            ):
+                variant_name = posixpath.join(directory, variant + extension)
+                path = os.path.join(root, variant_name)
+                if not os.path.exists(path):
+                    # Write then rename, so a reader never sees half a file
+                    partial = f'{path}.{os.getpid()}.tmp'
+                    with open(partial, 'wb') as f:
+                        f.write(_encode(image, image_format, quality))
+                    os.replace(partial, path)
+                files[key] = variant_name
+            variants[variant] = dict(files, width=image.width, height=image.height)
+    return variants
@@ -0,0 +1,212 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import reference_cache
+
+from .models import Category, Item
+
+# Bulk inventory import from CSV or JSON Lines.
+# Rows are read one at a time and written a batch at a time, so memory stays
+# flat however large the file is. Rows with an `id` update that item, other
+# rows create new items; categories are matched by name and created on demand.
+# Bad rows never stop the import, they go to the rejects writer instead.
+
+BATCH_SIZE = 500
+FORMATS = ('csv', 'jsonl')
+MAX_DESCRIPTION_LENGTH = 10000
+
+FIELDS = ['id', 'name', 'category', 'description', 'daily_rate', 'condition', 'is_available']
+UPDATE_FIELDS = ['name', 'category', 'description', 'daily_rate', 'condition', 'is_available', 'updated_at']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, file_format):
+    # Yield (line_number, row) pairs; unparsable lines become RowError rows
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, RowError('Invalid JSON.')
+            continue
+        yield line_number, row if isinstance(row, dict) else RowError('Each line must be a JSON object.')
+
+
+class RejectsWriter:
+    # Writes rejected rows with their line number and error, in the input format
+
+    def __init__(self, stream, file_format):
+        self.stream = stream
+        self.file_format = file_format
+        self.csv = None
+        if file_format == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=['line', 'error'] + FIELDS, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, line_number, row, error):
+        record = {'line': line_number, 'error': error, **(row if isinstance(row, dict) else {})}
+        if self.csv:
+            self.csv.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, default=str) + '\n')
+
+
+def _text(row, field, max_length, required=True):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{field} is required.')
+    if len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters.')
+    return value
+
+
+def _daily_rate(row):
+    try:
+        rate = Decimal(str(row.get('daily_rate', '')).strip())
+    except InvalidOperation:
+        raise RowError('daily_rate must be a number.')
+    if not rate.is_finite() or rate < 0 or rate >= Decimal('1e8'):
+        raise RowError('daily_rate must be between 0 and 99999999.99.')
+    return rate.quantize(Decimal('0.01'))
+
+
+def _is_available(row):
+    value = row.get('is_available')
+    if value is None or value == '':
+        return True
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError('is_available must be true or false.')
+
+
+def _item_id(row):
+    value = row.get('id')
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError('id must be an integer.')
+
+
+class InventoryImporter:
+
+    def __init__(self, batch_size=BATCH_SIZE, rejects=None, max_reported=50):
+        self.batch_size = batch_size
+        self.rejects = rejects
+        # The first rejects are also kept in memory for display
+        self.max_reported = max_reported
+        self.reported = []
+        # Every update of this import carries this updated_at, which is how
+        # items updated by an earlier batch are recognised without keeping
+        # their ids in memory
+        self.started_at = timezone.now()
+        self.counts = {'created': 0, 'updated': 0, 'rejected': 0, 'categories_created': 0}
+        self.categories = {
+            name.lower(): category_id for category_id, name in Category.objects.values_list('id', 'name')
+        }
+
+    def reject(self, line_number, row, error):
+        self.counts['rejected'] += 1
+        if self.rejects:
+            self.rejects.write(line_number, row, error)
+        if len(self.reported) < self.max_reported:
+            self.reported.append({'line': line_number, 'error': error})
+
+    def category_id(self, name):
+        key = name.lower()
+        if key not in self.categories:
+            self.categories[key] = Category.objects.create(name=name).id
+            self.counts['categories_created'] += 1
+        return self.categories[key]
+
+    def build(self, row):
+        # An unsaved item and its category name; the category is resolved in flush()
+        fields = {
+            'id': _item_id(row),
+            'name': _text(row, 'name', Item._meta.get_field('name').max_length),
+            'description': _text(row, 'description', MAX_DESCRIPTION_LENGTH, required=False),
+            'daily_rate': _daily_rate(row),
+            'condition': _text(row, 'condition', Item._meta.get_field('condition').max_length),
+            'is_available': _is_available(row),
+        }
+        category = _text(row, 'category', Category._meta.get_field('name').max_length)
+        return Item(**fields), category
+
+    def flush(self, batch):
+        # Categories are only created for rows that are actually written
+        new = [(item, category) for _, _, item, category in batch if item.id is None]
+        existing = [(line_number, row, item, category) for line_number, row, item, category in batch
+                    if item.id is not None]
+        found = dict(
+            Item.objects.filter(id__in=[item.id for _, _, item, _ in existing]).values_list('id', 'updated_at')
+        )
+        # id -> line, for this batch only
+        batch_lines = {}
+        updates = []
+        for line_number, row, item, category in existing:
+            # Applying two updates of one item would silently drop one of them
+            if item.id not in found:
+                self.reject(line_number, row, f'Item {item.id} does not exist.')
+            elif item.id in batch_lines:
+                self.reject(line_number, row, f'Item {item.id} is already updated by line {batch_lines[item.id]}.')
+            elif found[item.id] == self.started_at:
+                self.reject(line_number, row, f'Item {item.id} is already updated earlier in this import.')
+            else:
+                batch_lines[item.id] = line_number
+                item.updated_at = self.started_at
+                updates.append((item, category))
+        with transaction.atomic():
+            for item, category in new + updates:
+                item.category_id = self.category_id(category)
+            Item.objects.bulk_create([item for item, _ in new])
+            Item.objects.bulk_update([item for item, _ in updates], UPDATE_FIELDS)
+            # Bulk writes send no signals
+            reference_cache.invalidate(reference_cache.ITEM)
+        self.counts['created'] += len(new)
+        self.counts['updated'] += len(updates)
+
+    def run(self, rows):
+        # Import (line_number, row) pairs; returns the counts
+        batch = []
+        for line_number, row in rows:
+            if isinstance(row, RowError):
+                self.reject(line_number, None, str(row))
+                continue
+            try:
+                batch.append((line_number, row, *self.build(row)))
+            except RowError as e:
+                self.reject(line_number, row, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        return self.counts
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import importer
+
+
+class Command(BaseCommand):
+    help = 'Import inventory items from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format',
+            choices=importer.FORMATS,
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importer.BATCH_SIZE,
+            help=f'Rows written per bulk statement (default: {importer.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Write rejected rows here (default: <path>.rejects)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        file_format = options['format'] or importer.detect_format(options['path'])
+        rejects_path = options['rejects'] or f"{options['path']}.rejects"
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as source, \
+                    open(rejects_path, 'w', newline='', encoding='utf-8') as rejects:
+                run = importer.InventoryImporter(
+                    batch_size=options['batch_size'],
+                    rejects=importer.RejectsWriter(rejects, file_format)
+                )
+                counts = run.run(importer.read_rows(source, file_format))
+        except OSError as e:
+            raise CommandError(str(e))
+        except UnicodeDecodeError:
+            raise CommandError('The file must be UTF-8 encoded.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']} and updated {counts['updated']} items, "
+            f"created {counts['categories_created']} categories."
+        ))
+        if counts['rejected']:
+            self.stdout.write(self.style.WARNING(f"Rejected {counts['rejected']} rows, see {rejects_path}."))
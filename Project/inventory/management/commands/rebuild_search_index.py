@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for inventory items'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Full-text search index is only available on SQLite.')
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} items.'))
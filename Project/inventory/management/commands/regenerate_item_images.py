@@ -0,0 +1,68 @@
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import images, thumbnails
+from inventory.models import Item
+
+
+class Command(BaseCommand):
+    help = 'Build the resized variants of item images that are missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('item_ids', nargs='*', type=int, help='Only these items (default: all with an image)')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Delete and rebuild variants even when they are current'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=thumbnails.workers() or 1,
+            help='Worker processes'
+        )
+
+    def handle(self, *args, **options):
+        if not images.resizing_available():
+            raise CommandError('Pillow is not installed, so image variants cannot be built.')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive.')
+
+        items = Item.objects.exclude(image='').only('id', 'image', 'image_variants').order_by('id')
+        if options['item_ids']:
+            items = items.filter(id__in=options['item_ids'])
+        # Identical images share a stored name, so each one is resized once
+        pending = {}
+        for item in items.iterator():
+            if options['force'] or thumbnails.needs_variants(item):
+                pending.setdefault(item.image.name, []).append(item.id)
+        if not pending:
+            self.stdout.write('All item images are up to date.')
+            return
+
+        root = str(settings.MEDIA_ROOT)
+        if options['force']:
+            for name in pending:
+                shutil.rmtree(images.image_storage.path(images.variant_dir(name)), ignore_errors=True)
+
+        recorded, failed = 0, 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {pool.submit(images.render_variants, root, name): name for name in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{name}: {e}')
+                    continue
+                for item_id in pending[name]:
+                    recorded += thumbnails.record(item_id, name, variants)
+
+        message = f'Built variants for {len(pending) - failed} images, updated {recorded} items.'
+        if failed:
+            raise CommandError(f'{message} {failed} images failed.')
+        self.stdout.write(self.style.SUCCESS(message))
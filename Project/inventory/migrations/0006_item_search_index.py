@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# The full-text index as it stood when this migration was written; kept
+# literal so later changes to inventory.search cannot alter this migration
+INSTALL_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS inventory_item_fts USING fts5(
+        name, description,
+        content='inventory_item', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_item_fts_ai AFTER INSERT ON inventory_item BEGIN
+        INSERT INTO inventory_item_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_item_fts_ad AFTER DELETE ON inventory_item BEGIN
+        INSERT INTO inventory_item_fts(inventory_item_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_item_fts_au AFTER UPDATE OF name, description ON inventory_item BEGIN
+        INSERT INTO inventory_item_fts(inventory_item_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO inventory_item_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO inventory_item_fts(inventory_item_fts) VALUES ('rebuild')",
+]
+
+UNINSTALL_SQL = [
+    'DROP TRIGGER IF EXISTS inventory_item_fts_ai',
+    'DROP TRIGGER IF EXISTS inventory_item_fts_ad',
+    'DROP TRIGGER IF EXISTS inventory_item_fts_au',
+    'DROP TABLE IF EXISTS inventory_item_fts',
+]
+
+
+def install_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends search with LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in INSTALL_SQL:
+        schema_editor.execute(statement)
+
+
+def uninstall_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in UNINSTALL_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_category_updated_at_item_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
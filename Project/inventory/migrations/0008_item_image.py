@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:02
+
+import inventory.images
+from django.db import migrations, models
+
+# The full-text index as it stood when this migration was written; kept
+# literal so later changes to inventory.search cannot alter this migration
+INSTALL_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS inventory_item_fts USING fts5(
+        name, description,
+        content='inventory_item', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_item_fts_ai AFTER INSERT ON inventory_item BEGIN
+        INSERT INTO inventory_item_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_item_fts_ad AFTER DELETE ON inventory_item BEGIN
+        INSERT INTO inventory_item_fts(inventory_item_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_item_fts_au AFTER UPDATE OF name, description ON inventory_item BEGIN
+        INSERT INTO inventory_item_fts(inventory_item_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO inventory_item_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO inventory_item_fts(inventory_item_fts) VALUES ('rebuild')",
+]
+
+
+def install_search_index(apps, schema_editor):
+    # Adding these columns rebuilds inventory_item on SQLite, which drops the
+    # full-text triggers; put them back and reindex
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in INSTALL_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='image',
+            field=models.FileField(blank=True, max_length=255, storage=inventory.images.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
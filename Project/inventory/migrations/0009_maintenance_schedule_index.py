@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_item_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['maintenance_date', 'id'], name='maintenance_date_id_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.core.validators import MinValueValidator
 from django.conf import settings
 from django.utils import timezone
 
+from .images import current_variants, image_storage
+
 # Create models
 
 class Category(models.Model):
@@ -30,12 +32,40 @@ class Item(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_maintained = models.DateTimeField(null=True, blank=True)
+    # Stored under a content hash; see inventory.images
+    image = models.FileField(storage=image_storage, max_length=255, blank=True)
+    # Resized copies of `image`, recorded by inventory.thumbnails once built
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.name
 
+    def image_variant(self, variant):
+        # URLs and size of a resized copy of the image, or None until it is built
+        files = current_variants(self.image.name, self.image_variants)
+        if not files or variant not in files:
+            return None
+        files = files[variant]
+        return {
+            'jpeg': image_storage.url(files['jpeg']),
+            'webp': image_storage.url(files['webp']),
+            'width': files['width'],
+            'height': files['height'],
+        }
+
+    @property
+    def thumbnail(self):
+        return self.image_variant('thumb')
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Catalog pages: keyset order, optionally within one category
+            models.Index(fields=['name', 'id'], name='item_name_id_idx'),
+            models.Index(fields=['category', 'name', 'id'], name='item_category_name_idx'),
+            # Available items per category (home page, reports)
+            models.Index(fields=['category', 'is_available', 'name'], name='item_category_available_idx'),
+        ]
 
 class Maintenance(models.Model):
     # Maintenance scheduling and tracking
@@ -65,3 +95,11 @@ class Maintenance(models.Model):
 
     class Meta:
         ordering = ['-maintenance_date']
+        indexes = [
+            # Availability checks and calendars for given items
+            models.Index(fields=['item', 'status', 'maintenance_date'], name='maintenance_item_status_idx'),
+            # Schedule and reports by status over a date range
+            models.Index(fields=['status', 'maintenance_date'], name='maintenance_status_date_idx'),
+            # The unfiltered schedule, in page order
+            models.Index(fields=['maintenance_date', 'id'], name='maintenance_date_id_idx'),
+        ]
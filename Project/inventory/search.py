@@ -0,0 +1,145 @@
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+from .models import Item
+
+# Full-text search over Item name and description.
+# On SQLite an FTS5 external-content table mirrors inventory_item and is kept
+# in sync by triggers, so bulk_create/update and raw SQL writes are indexed
+# too. Other backends fall back to a case-insensitive LIKE search.
+
+FTS_TABLE = 'inventory_item_fts'
+SEARCH_LIMIT = 50
+
+# Column weights for bm25(): a hit in the name counts ten times a description hit
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='inventory_item', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory_item BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory_item BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON inventory_item BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+UNINSTALL_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def is_supported(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def install(schema_editor):
+    # Create the FTS table and triggers; safe to call again after a table rebuild
+    if not is_supported(schema_editor.connection):
+        return
+    for statement in INSTALL_SQL + [REBUILD_SQL]:
+        schema_editor.execute(statement)
+
+
+def uninstall(schema_editor):
+    if not is_supported(schema_editor.connection):
+        return
+    for statement in UNINSTALL_SQL:
+        schema_editor.execute(statement)
+
+
+def rebuild():
+    # Reindex every item from inventory_item; returns the number of indexed rows
+    with connection.cursor() as cursor:
+        for statement in INSTALL_SQL + [REBUILD_SQL]:
+            cursor.execute(statement)
+    return Item.objects.count()
+
+
+def match_expression(query):
+    # Quote every term so user input can never be parsed as FTS5 syntax;
+    # the trailing * makes the last-typed word work as a prefix
+    terms = TERM_RE.findall(query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _like_condition(terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def _like_search(terms, category_id, limit):
+    items = Item.objects.filter(_like_condition(terms))
+    if category_id:
+        items = items.filter(category_id=category_id)
+    ids = items.order_by('name', 'id').values_list('id', flat=True)
+    return list(ids[:limit] if limit else ids)
+
+
+def search_item_ids(query, category_id=None, limit=SEARCH_LIMIT):
+    # Return matching item ids, best match first
+    match = match_expression(query)
+    if not match:
+        return []
+    if not is_supported():
+        return _like_search(TERM_RE.findall(query), category_id, limit)
+
+    sql = f"""
+        SELECT f.rowid FROM {FTS_TABLE} f
+        JOIN inventory_item i ON i.id = f.rowid
+        WHERE {FTS_TABLE} MATCH %s {'AND i.category_id = %s' if category_id else ''}
+        ORDER BY bm25({FTS_TABLE}, %s, %s), f.rowid
+        LIMIT %s
+    """
+    params = [match] + ([category_id] if category_id else [])
+    params += [NAME_WEIGHT, DESCRIPTION_WEIGHT, limit or -1]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        # Index missing (e.g. migrations not applied); answer from the table instead
+        return _like_search(TERM_RE.findall(query), category_id, limit)
+
+
+def filter_queryset(queryset, query):
+    # Unranked filter for callers that keep their own ordering (e.g. the admin)
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    if not is_supported():
+        return queryset.filter(_like_condition(TERM_RE.findall(query)))
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+    ))
+
+
+def ranked(queryset, ids):
+    # Restrict a queryset to `ids` and keep their order
+    return queryset.filter(id__in=ids).order_by(
+        Case(*[When(id=item_id, then=position) for position, item_id in enumerate(ids)],
+             output_field=IntegerField())
+    )
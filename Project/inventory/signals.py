@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import thumbnails
+from .models import Item
+
+# Resized image variants are built in the background after an item is saved
+
+
+@receiver(post_save, sender=Item)
+def item_saved(sender, instance, **kwargs):
+    thumbnails.schedule(instance)
@@ -1,7 +1,22 @@
-from django.test import TestCase, Client
+import csv
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zlib
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from core.models import UserProfile
+from inventory import images, search, thumbnails
+from inventory.importer import InventoryImporter
 from inventory.models import Category, Item
 from decimal import Decimal
 
@@ -104,4 +119,285 @@ class InventoryManagementTests(TestCase):
         # Test item can be marked as unavailable
         item.is_available = False
         item.save()
-        self.assertFalse(item.is_available) 
\ No newline at end of file
+        self.assertFalse(item.is_available) 
+
+class ItemSearchTests(TestCase):
+    def setUp(self):
+        self.tools = Category.objects.create(name='Tools')
+        self.audio = Category.objects.create(name='Audio')
+        self.drill = Item.objects.create(
+            name='Cordless Drill', description='Battery powered drill with two batteries',
+            category=self.tools, daily_rate=Decimal('15.00'), condition='good'
+        )
+        self.saw = Item.objects.create(
+            name='Circular Saw', description='Cuts wood; pairs well with a drill',
+            category=self.tools, daily_rate=Decimal('20.00'), condition='good'
+        )
+        self.speaker = Item.objects.create(
+            name='PA Speaker', description='Loud speaker for events',
+            category=self.audio, daily_rate=Decimal('40.00'), condition='good'
+        )
+
+    def test_ranked_by_bm25(self):
+        # The name hit outranks the description-only hit
+        self.assertEqual(search.search_item_ids('drill'), [self.drill.id, self.saw.id])
+        self.assertEqual(search.search_item_ids('dril'), [self.drill.id, self.saw.id])
+        self.assertEqual(search.search_item_ids('speaker', category_id=self.tools.id), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.speaker.name = 'Subwoofer'
+        self.speaker.description = 'Deep bass'
+        self.speaker.save()
+        self.assertEqual(search.search_item_ids('speaker'), [])
+        self.assertEqual(search.search_item_ids('bass'), [self.speaker.id])
+
+        self.saw.delete()
+        self.assertEqual(search.search_item_ids('drill'), [self.drill.id])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(search.search_item_ids('drill" *('), [self.drill.id, self.saw.id])
+        self.assertEqual(search.search_item_ids('!!!'), [])
+
+    def test_catalog_and_admin_search(self):
+        response = self.client.get(reverse('catalog'), {'q': 'drill'})
+        self.assertEqual([item.id for item in response.context['items']], [self.drill.id, self.saw.id])
+
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:inventory_item_changelist'), {'q': 'speaker'})
+        self.assertEqual(list(response.context['cl'].queryset), [self.speaker])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(search.search_item_ids('drill'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search.search_item_ids('drill'), [self.drill.id, self.saw.id])
+
+
+class ImportInventoryTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools')
+        self.drill = Item.objects.create(
+            name='Drill', description='Cordless drill', category=self.category,
+            daily_rate=Decimal('15.00'), condition='Good'
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_csv_import_creates_updates_and_rejects(self):
+        path = self.write('items.csv', (
+            'id,name,category,description,daily_rate,condition,is_available\n'
+            f'{self.drill.id},Hammer Drill,tools,Now with hammer mode,18.50,Good,yes\n'
+            ',Tent,Camping,Four person tent,20,Excellent,\n'
+            ',Stove,Camping,Gas stove,cheap,Good,\n'
+            '999999,Ghost,Tools,,5,Good,\n'
+        ))
+        out = StringIO()
+        call_command('import_inventory', path, '--batch-size', '2', stdout=out)
+
+        self.drill.refresh_from_db()
+        self.assertEqual(self.drill.name, 'Hammer Drill')
+        self.assertEqual(self.drill.daily_rate, Decimal('18.50'))
+        self.assertTrue(Item.objects.filter(name='Tent', category__name='Camping').exists())
+        self.assertEqual(Category.objects.count(), 2)
+        # The imported rows are searchable right away
+        self.assertEqual(search.search_item_ids('hammer'), [self.drill.id])
+
+        with open(path + '.rejects', encoding='utf-8') as f:
+            rejects = list(csv.DictReader(f))
+        self.assertEqual([(row['line'], row['error']) for row in rejects], [
+            ('4', 'daily_rate must be a number.'),
+            ('5', 'Item 999999 does not exist.'),
+        ])
+
+    def test_duplicate_ids_and_missing_items_are_rejected(self):
+        path = self.write('items.csv', (
+            'id,name,category,description,daily_rate,condition,is_available\n'
+            f'{self.drill.id},First Drill,Tools,,16,Good,\n'
+            f'{self.drill.id},Second Drill,Tools,,17,Good,\n'
+            '999999,Ghost,Haunted,,5,Good,\n'
+        ))
+        call_command('import_inventory', path, stdout=StringIO())
+
+        self.drill.refresh_from_db()
+        self.assertEqual(self.drill.name, 'First Drill')
+        # The rejected row's category is not created
+        self.assertFalse(Category.objects.filter(name='Haunted').exists())
+        with open(path + '.rejects', encoding='utf-8') as f:
+            rejects = list(csv.DictReader(f))
+        self.assertEqual([(row['line'], row['error']) for row in rejects], [
+            ('3', f'Item {self.drill.id} is already updated by line 2.'),
+            ('4', 'Item 999999 does not exist.'),
+        ])
+
+    def test_duplicate_ids_in_later_batches_are_rejected(self):
+        rows = [(line_number, {'id': self.drill.id, 'name': name, 'category': 'Tools',
+                               'daily_rate': '16', 'condition': 'Good'})
+                for line_number, name in [(2, 'First Drill'), (3, 'Second Drill')]]
+        importer = InventoryImporter(batch_size=1)
+        self.assertEqual(importer.run(rows)['updated'], 1)
+        self.assertEqual(importer.reported, [
+            {'line': 3, 'error': f'Item {self.drill.id} is already updated earlier in this import.'},
+        ])
+        self.drill.refresh_from_db()
+        self.assertEqual(self.drill.name, 'First Drill')
+
+    def test_jsonl_import(self):
+        path = self.write('items.jsonl', (
+            '{"name": "Kayak", "category": "Water", "daily_rate": "30", "condition": "Good"}\n'
+            'not json\n'
+        ))
+        call_command('import_inventory', path, stdout=StringIO())
+        self.assertTrue(Item.objects.filter(name='Kayak').exists())
+        with open(path + '.rejects', encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['error'], 'Invalid JSON.')
+
+    def test_upload_screen_requires_manager(self):
+        manager = User.objects.create_user(username='manager', email='manager@example.com', password='password')
+        UserProfile.objects.filter(user=manager).update(role='manager')
+        self.client.force_login(manager)
+        upload = SimpleUploadedFile('items.csv', b'name,category,daily_rate,condition\nLadder,Tools,8,Good\n')
+        response = self.client.post(reverse('import_inventory'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['counts']['created'], 1)
+        self.assertTrue(Item.objects.filter(name='Ladder').exists())
+
+
+def png_bytes(width=2, height=2):
+    # A small valid PNG without needing Pillow
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + b'\xff\x00\x00' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+@override_settings(IMAGE_WORKERS=0)
+class ItemImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.manager = User.objects.create_user(
+            username='manager', email='manager@example.com', password='managerpass'
+        )
+        self.manager.userprofile.role = 'manager'
+        self.manager.userprofile.save()
+        self.client.login(username='manager', password='managerpass')
+        self.category = Category.objects.create(name='Cameras', description='')
+        self.item = Item.objects.create(
+            name='Camera', category=self.category, daily_rate=Decimal('20.00'), description='', condition='Good'
+        )
+        self.png = png_bytes()
+
+    def upload(self, name='photo.png', content=None):
+        return SimpleUploadedFile(name, self.png if content is None else content, content_type='image/png')
+
+    def test_images_are_named_after_their_content(self):
+        digest = hashlib.sha256(self.png).hexdigest()
+        self.item.image = self.upload()
+        self.item.save()
+        self.assertEqual(self.item.image.name, f'images/{digest[:2]}/{digest}.png')
+
+        # The same bytes under another file name share the stored file
+        other = Item.objects.create(
+            name='Second camera', category=self.category, daily_rate=Decimal('20.00'),
+            description='', condition='Good', image=self.upload('copy.PNG')
+        )
+        self.assertEqual(other.image.name, self.item.image.name)
+        self.assertEqual(os.listdir(os.path.dirname(self.item.image.path)), [f'{digest}.png'])
+
+    def test_upload_validation(self):
+        images.validate_upload(self.upload())
+        with self.assertRaises(images.ImageError):
+            images.validate_upload(self.upload('notes.png', b'just some text'))
+
+    def test_manager_can_upload_and_remove_an_image(self):
+        response = self.client.post(reverse('manage_inventory'), {
+            'action': 'edit', 'item_id': self.item.id, 'name': 'Camera',
+            'category': self.category.id, 'daily_rate': '20.00', 'description': 'Mirrorless',
+            'condition': 'Good', 'image': self.upload()
+        })
+        self.assertEqual(response.status_code, 302)
+        self.item.refresh_from_db()
+        self.assertTrue(self.item.image.name.startswith('images/'))
+
+        self.client.post(reverse('manage_inventory'), {
+            'action': 'edit', 'item_id': self.item.id, 'name': 'Camera',
+            'category': self.category.id, 'daily_rate': '20.00', 'description': 'Mirrorless',
+            'condition': 'Good', 'image': self.upload('notes.png', b'not an image')
+        })
+        self.item.refresh_from_db()
+        self.assertTrue(self.item.image)
+
+        self.client.post(reverse('manage_inventory'), {
+            'action': 'edit', 'item_id': self.item.id, 'name': 'Camera',
+            'category': self.category.id, 'daily_rate': '20.00', 'description': 'Mirrorless',
+            'condition': 'Good', 'remove_image': 'on'
+        })
+        self.item.refresh_from_db()
+        self.assertFalse(self.item.image)
+
+    def test_images_are_served_with_immutable_caching(self):
+        self.item.image = self.upload()
+        self.item.save()
+        url = self.item.image.url
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.png)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+        self.assertEqual(self.client.get(url.replace('.png', '.jpg')).status_code, 404)
+        self.assertEqual(self.client.get('/media/images/../../settings.py').status_code, 404)
+
+    def test_thumbnail_follows_recorded_variants(self):
+        self.item.image = self.upload()
+        self.item.save()
+        self.assertIsNone(self.item.thumbnail)
+
+        name = self.item.image.name
+        directory = images.variant_dir(name)
+        variants = {
+            variant: {'jpeg': f'{directory}/{variant}.jpg', 'webp': f'{directory}/{variant}.webp',
+                      'width': 2, 'height': 2}
+            for variant in images.VARIANTS
+        }
+        self.assertEqual(thumbnails.record(self.item.id, name, variants), 1)
+        self.item.refresh_from_db()
+        self.assertFalse(thumbnails.needs_variants(self.item))
+        self.assertTrue(self.item.thumbnail['webp'].endswith('/thumb.webp'))
+        self.assertContains(self.client.get(reverse('catalog')), self.item.thumbnail['webp'])
+
+        # A stale result for an image the item no longer has is ignored
+        self.assertEqual(thumbnails.record(self.item.id, 'images/00/old.png', variants), 0)
+        # So is one built with an older variant spec
+        self.item.image_variants['version'] = images.VARIANTS_VERSION - 1
+        self.assertTrue(thumbnails.needs_variants(self.item))
+
+    def test_images_do_not_break_search(self):
+        self.item.image = self.upload()
+        self.item.save()
+        self.assertEqual(search.search_item_ids('camera'), [self.item.id])
+
+    @skipUnless(images.resizing_available(), 'Pillow is not installed')
+    def test_variants_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.image = self.upload(content=png_bytes(1600, 1200))
+            self.item.save()
+        self.item.refresh_from_db()
+        thumb = self.item.image_variant('thumb')
+        self.assertEqual((thumb['width'], thumb['height']), (480, 360))
+        self.assertTrue(images.image_storage.exists(thumb['webp']))
@@ -0,0 +1,88 @@
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import images
+from .models import Item
+
+logger = logging.getLogger(__name__)
+
+# Background variant generation.
+# Saving an item with a new image schedules its variants once the save is
+# committed. The resizing runs in a process pool, so it neither blocks the
+# request nor competes with request threads for the GIL; the pool only sees
+# file names, and the result is recorded from this process. With
+# IMAGE_WORKERS = 0 the work runs inline instead (tests, management commands).
+
+_pool = None
+_pool_lock = threading.Lock()
+_warned = False
+
+
+def workers():
+    return getattr(settings, 'IMAGE_WORKERS', 2)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers())
+        return _pool
+
+
+def needs_variants(item):
+    return bool(item.image) and images.current_variants(item.image.name, item.image_variants) is None
+
+
+def record(item_id, name, variants):
+    # Store the variants unless the item's image changed in the meantime
+    return Item.objects.filter(id=item_id, image=name).update(
+        image_variants={'source': name, 'version': images.VARIANTS_VERSION, 'files': variants},
+        # Let conditional GETs of the listings see the new thumbnail
+        updated_at=timezone.now()
+    )
+
+
+def _finished(item_id, name, future):
+    # Runs on the pool's result thread
+    try:
+        record(item_id, name, future.result())
+    except Exception:
+        logger.warning('Could not build image variants for item %s', item_id, exc_info=True)
+    finally:
+        connections.close_all()
+
+
+def generate(item_id, name):
+    # Build and record the variants of one image; returns True if it was done inline
+    if workers() == 0:
+        return bool(record(item_id, name, images.render_variants(str(settings.MEDIA_ROOT), name)))
+    future = _executor().submit(images.render_variants, str(settings.MEDIA_ROOT), name)
+    future.add_done_callback(lambda future: _finished(item_id, name, future))
+    return False
+
+
+def schedule(item):
+    # Queue variant generation for a saved item if its image has none yet
+    global _warned
+    if not needs_variants(item):
+        return
+    if not images.resizing_available():
+        if not _warned:
+            logger.warning('Pillow is not installed; item images are served without resized variants')
+            _warned = True
+        return
+    item_id, name = item.pk, item.image.name
+
+    def run():
+        try:
+            generate(item_id, name)
+        except Exception:
+            logger.warning('Could not build image variants for item %s', item_id, exc_info=True)
+
+    transaction.on_commit(run)
@@ -11,9 +11,14 @@ class ReservationAdmin(admin.ModelAdmin):
     list_filter = ('status', 'reservation_date')
     search_fields = ('user__username', 'user__email')
     inlines = [ReservationItemInline]
+    list_select_related = ('user',)
+    # Skip the unfiltered COUNT(*) on every changelist page; use the export for bulk reads
+    show_full_result_count = False
 
 @admin.register(ReservationItem)
 class ReservationItemAdmin(admin.ModelAdmin):
     list_display = ('reservation', 'item', 'quantity', 'price_per_day', 'subtotal')
     list_filter = ('reservation__status',)
     search_fields = ('item__name', 'reservation__user__username')
+    list_select_related = ('reservation__user', 'item')
+    show_full_result_count = False
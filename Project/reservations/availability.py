@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.utils import timezone
+
+from core.cache_versions import aget_versions, bump, get_versions, is_shared
+from inventory.models import Maintenance
+from .models import Reservation, ReservationItem
+
+logger = logging.getLogger(__name__)
+
+# Statuses that block an item for the dates they cover
+BLOCKING_RESERVATION_STATUSES = ('confirmed', 'active', 'overdue')
+BLOCKING_MAINTENANCE_STATUSES = ('SCHEDULED', 'IN_PROGRESS')
+
+# Conflict reasons returned by find_conflict()
+MAINTENANCE = 'maintenance'
+RESERVED = 'reserved'
+
+
+# Calendar bitmaps: one character per day, '1' free and '0' blocked
+CALENDAR_DAYS = 90
+CALENDAR_MAX_DAYS = 366
+CALENDAR_CACHE_TIMEOUT = 60 * 60
+# Items per calendar query when an async request builds several at once
+CALENDAR_CHUNK_SIZE = 25
+
+
+def version_key(item_id):
+    return f'availability:item:{item_id}'
+
+
+def calendar_key(item_id, start, days, version):
+    return f'availability:calendar:{item_id}:{start.isoformat()}:{days}:{version}'
+
+
+class Intervals:
+    # Closed intervals sorted by start, with a running maximum of the ends.
+    # "Does anything overlap [start, end]?" is one bisect plus one lookup.
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals)
+        self.starts = [start for start, _ in intervals]
+        self.max_ends = list(accumulate((end for _, end in intervals), max))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        idx = bisect_right(self.starts, end)
+        return idx > 0 and self.max_ends[idx - 1] >= start
+
+
+class ItemSchedule:
+    # Blocking intervals for one item, tagged with the cache version it was loaded at
+
+    def __init__(self, version, maintenance, reservations):
+        self.version = version
+        self.maintenance = Intervals(maintenance)
+        self.reservations = Intervals(reservations)
+
+    def find_conflict(self, start, end):
+        if self.maintenance.overlaps(start, end):
+            return MAINTENANCE
+        if self.reservations.overlaps(start, end):
+            return RESERVED
+        return None
+
+
+def load_schedule(item_id, version):
+    maintenance = [
+        (date, date) for date in Maintenance.objects.filter(
+            item_id=item_id,
+            status__in=BLOCKING_MAINTENANCE_STATUSES
+        ).values_list('maintenance_date', flat=True)
+    ]
+    reservations = list(ReservationItem.objects.filter(
+        item_id=item_id,
+        reservation__status__in=BLOCKING_RESERVATION_STATUSES
+    ).values_list('reservation__start_date', 'reservation__end_date'))
+    return ItemSchedule(version, maintenance, reservations)
+
+
+def find_conflicts_in_db(item_ids, start, end):
+    # Authoritative check straight against the database, one UNION query for any number of items
+    maintenance = Maintenance.objects.filter(
+        item_id__in=item_ids,
+        maintenance_date__range=(start, end),
+        status__in=BLOCKING_MAINTENANCE_STATUSES
+    ).order_by().annotate(reason=Value(MAINTENANCE)).values_list('item_id', 'reason')
+    reserved = ReservationItem.objects.filter(
+        item_id__in=item_ids,
+        reservation__start_date__lte=end,
+        reservation__end_date__gte=start,
+        reservation__status__in=BLOCKING_RESERVATION_STATUSES
+    ).annotate(reason=Value(RESERVED)).values_list('item_id', 'reason')
+
+    conflicts = {}
+    for item_id, reason in maintenance.union(reserved):
+        # Maintenance wins when an item is blocked for both reasons
+        if conflicts.get(item_id) != MAINTENANCE:
+            conflicts[item_id] = reason
+    return conflicts
+
+
+def free_during(start, end):
+    # Filter for Item querysets: nothing blocks the item during [start, end].
+    # Same overlap rules as find_conflicts_in_db(), as NOT EXISTS subqueries,
+    # so it composes with other filters, ordering and LIMIT. The blocking
+    # reservations in the period are selected once, uncorrelated; correlating
+    # the date conditions instead lets SQLite walk every blocking reservation
+    # for each candidate item.
+    blocking = Reservation.objects.filter(
+        status__in=BLOCKING_RESERVATION_STATUSES,
+        start_date__lte=end,
+        end_date__gte=start
+    ).values('id')
+    reserved = ReservationItem.objects.filter(item_id=OuterRef('pk'), reservation_id__in=blocking)
+    maintenance = Maintenance.objects.filter(
+        item_id=OuterRef('pk'),
+        status__in=BLOCKING_MAINTENANCE_STATUSES,
+        maintenance_date__range=(start, end)
+    )
+    return ~Exists(reserved) & ~Exists(maintenance)
+
+
+class AvailabilityIndex:
+    # Per-process, lazily loaded index of blocking intervals per item.
+    # Entries are validated against a version token in the shared cache, so a
+    # change committed by any worker invalidates every other worker's copy.
+
+    def __init__(self, max_items=None):
+        self.max_items = max_items
+        self._schedules = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _limit(self):
+        if self.max_items is None:
+            return getattr(settings, 'AVAILABILITY_INDEX_MAX_ITEMS', 10000)
+        return self.max_items
+
+    def get_schedules(self, item_ids):
+        item_ids = list(dict.fromkeys(item_ids))
+        versions = get_versions(version_key(item_id) for item_id in item_ids)
+        # Rows read inside a transaction may still be rolled back, so only
+        # schedules loaded from committed data are kept for later requests
+        cacheable = not transaction.get_connection().in_atomic_block
+        schedules = {}
+        for item_id in item_ids:
+            version = versions.get(version_key(item_id))
+            if version is None:
+                # The cache cannot hold versions, so nothing can be trusted
+                raise LookupError(f'No availability version for item {item_id}')
+            with self._lock:
+                schedule = self._schedules.get(item_id)
+            if schedule is None or schedule.version != version:
+                schedule = load_schedule(item_id, version)
+                if not cacheable:
+                    schedules[item_id] = schedule
+                    continue
+            with self._lock:
+                self._schedules[item_id] = schedule
+                self._schedules.move_to_end(item_id)
+                while len(self._schedules) > self._limit():
+                    self._schedules.popitem(last=False)
+            schedules[item_id] = schedule
+        return schedules
+
+    def find_conflicts(self, item_ids, start, end):
+        # Return {item_id: reason} for every item blocked during [start, end]
+        schedules = self.get_schedules(item_ids)
+        conflicts = {}
+        for item_id, schedule in schedules.items():
+            reason = schedule.find_conflict(start, end)
+            if reason:
+                conflicts[item_id] = reason
+        return conflicts
+
+    def discard(self, item_ids):
+        with self._lock:
+            for item_id in item_ids:
+                self._schedules.pop(item_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._schedules.clear()
+
+
+index = AvailabilityIndex()
+
+
+def find_conflicts(item_ids, start, end):
+    # Consult the index first and fall back to the database if it is unusable
+    if not is_shared():
+        # A supported setup (see Cache in the README), so not worth a warning
+        logger.debug('Cache is local to this process, checking database')
+        return find_conflicts_in_db(item_ids, start, end)
+    try:
+        return index.find_conflicts(item_ids, start, end)
+    except Exception:
+        logger.warning('Availability index unavailable, checking database', exc_info=True)
+        return find_conflicts_in_db(item_ids, start, end)
+
+
+def find_conflict(item_id, start, end):
+    return find_conflicts([item_id], start, end).get(item_id)
+
+
+def invalidate_items(item_ids):
+    # Drop local copies now and bump the shared versions once the data is committed
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    index.discard(item_ids)
+    keys = [version_key(item_id) for item_id in item_ids]
+    transaction.on_commit(lambda: bump(keys))
+
+
+def _day_bounds(first_day, last_day):
+    window_start = timezone.make_aware(datetime.combine(first_day, time.min))
+    window_end = timezone.make_aware(datetime.combine(last_day, time.max))
+    return window_start, window_end
+
+
+def _calendar_rows(item_ids, start, days):
+    # Blocked periods for many items as a single UNION query over both sources
+    last_day = start + timedelta(days=days - 1)
+    window_start, window_end = _day_bounds(start, last_day)
+    reserved = ReservationItem.objects.filter(
+        item_id__in=item_ids,
+        reservation__status__in=BLOCKING_RESERVATION_STATUSES,
+        reservation__start_date__lte=window_end,
+        reservation__end_date__gte=window_start
+    ).order_by().values_list('item_id', 'reservation__start_date', 'reservation__end_date')
+    maintenance = Maintenance.objects.filter(
+        item_id__in=item_ids,
+        status__in=BLOCKING_MAINTENANCE_STATUSES,
+        maintenance_date__range=(window_start, window_end)
+    ).order_by().values_list('item_id', 'maintenance_date', 'maintenance_date')
+    return reserved.union(maintenance, all=True)
+
+
+def _fill_calendars(item_ids, start, days, rows):
+    calendars = {item_id: bytearray(b'1' * days) for item_id in item_ids}
+    for item_id, blocked_from, blocked_to in rows:
+        first = max((timezone.localdate(blocked_from) - start).days, 0)
+        last = min((timezone.localdate(blocked_to) - start).days, days - 1)
+        calendar = calendars[item_id]
+        calendar[first:last + 1] = b'0' * (last - first + 1)
+    return {item_id: calendar.decode() for item_id, calendar in calendars.items()}
+
+
+def build_calendars(item_ids, start, days):
+    return _fill_calendars(item_ids, start, days, _calendar_rows(item_ids, start, days))
+
+
+async def abuild_calendars(item_ids, start, days):
+    rows = [row async for row in _calendar_rows(item_ids, start, days)]
+    return _fill_calendars(item_ids, start, days, rows)
+
+
+def _calendar_keys(item_ids, versions, start, days):
+    # Cache keys for the items whose version is known
+    keys = {}
+    for item_id in item_ids:
+        version = versions.get(version_key(item_id))
+        if version is not None:
+            keys[item_id] = calendar_key(item_id, start, days, version)
+    return keys
+
+
+def _split_cached(item_ids, keys, cached):
+    calendars = {}
+    missing = []
+    for item_id in item_ids:
+        key = keys.get(item_id)
+        if key in cached:
+            calendars[item_id] = cached[key]
+        else:
+            missing.append(item_id)
+    return calendars, missing
+
+
+def availability_calendar(item_ids, start, days=CALENDAR_DAYS):
+    # Return {item_id: bitmap} for the days starting at `start`, cached per item
+    item_ids = list(dict.fromkeys(item_ids))
+    keys = _calendar_keys(item_ids, get_versions(version_key(item_id) for item_id in item_ids), start, days)
+    calendars, missing = _split_cached(item_ids, keys, cache.get_many(keys.values()))
+
+    if missing:
+        built = build_calendars(missing, start, days)
+        calendars.update(built)
+        if transaction.get_connection().in_atomic_block:
+            # Same rule as the index: never cache rows that may be rolled back
+            return calendars
+        cache.set_many(
+            {keys[item_id]: bitmap for item_id, bitmap in built.items() if item_id in keys},
+            timeout=CALENDAR_CACHE_TIMEOUT
+        )
+    return calendars
+
+
+def _in_atomic_block():
+    return transaction.get_connection().in_atomic_block
+
+
+async def aavailability_calendar(item_ids, start, days=CALENDAR_DAYS):
+    # availability_calendar() for async views. Cache misses are built in
+    # chunks whose queries are issued concurrently.
+    item_ids = list(dict.fromkeys(item_ids))
+    versions = await aget_versions(version_key(item_id) for item_id in item_ids)
+    keys = _calendar_keys(item_ids, versions, start, days)
+    calendars, missing = _split_cached(item_ids, keys, await cache.aget_many(keys.values()))
+
+    if missing:
+        chunks = [missing[i:i + CALENDAR_CHUNK_SIZE] for i in range(0, len(missing), CALENDAR_CHUNK_SIZE)]
+        built = {}
+        for chunk in await asyncio.gather(*(abuild_calendars(chunk, start, days) for chunk in chunks)):
+            built.update(chunk)
+        calendars.update(built)
+        # Ask on the thread the ORM runs queries on, where the transaction lives
+        if await sync_to_async(_in_atomic_block)():
+            return calendars
+        await cache.aset_many(
+            {keys[item_id]: bitmap for item_id, bitmap in built.items() if item_id in keys},
+            timeout=CALENDAR_CACHE_TIMEOUT
+        )
+    return calendars
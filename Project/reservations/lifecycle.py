@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import availability
+from .models import Reservation, ReservationItem
+from .services import COMPLETED, complete_returns
+
+# Reservation lifecycle engine.
+# Moves reservations through confirmed -> active -> overdue (-> completed)
+# with set-based updates, a bounded batch at a time, so staff views can read
+# the precomputed status instead of scanning date ranges on every request.
+# Run it with the run_reservation_lifecycle management command.
+
+BATCH_SIZE = 500
+# Bookings store 00:00 of their last day as end_date and that day is paid
+# for, so a rental runs until end_date plus one day
+RENTAL_END_OFFSET = timedelta(days=1)
+
+
+def _advance(queryset, status, timestamp_field, now, batch_size):
+    # Move every row of `queryset` to `status`; returns the number moved.
+    # The queryset's own filter is repeated in each UPDATE, so a row changed
+    # by someone else between the SELECT and the UPDATE is left alone.
+    moved = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return moved
+        with transaction.atomic():
+            moved += queryset.filter(id__in=ids).update(
+                status=status, updated_at=now, **{timestamp_field: now}
+            )
+            item_ids = ReservationItem.objects.filter(reservation_id__in=ids).values_list('item_id', flat=True)
+            # QuerySet.update sends no signals
+            availability.invalidate_items(item_ids)
+
+
+def activate_started(now, batch_size=BATCH_SIZE):
+    return _advance(
+        Reservation.objects.filter(status='confirmed', start_date__lte=now),
+        'active', 'activated_at', now, batch_size
+    )
+
+
+def mark_overdue(now, batch_size=BATCH_SIZE):
+    return _advance(
+        Reservation.objects.filter(status='active', end_date__lte=now - RENTAL_END_OFFSET),
+        'overdue', 'overdue_at', now, batch_size
+    )
+
+
+def complete_overdue(batch_size=BATCH_SIZE):
+    # Treat overdue rentals as returned; only used with RESERVATION_AUTO_COMPLETE
+    completed = 0
+    while True:
+        ids = list(Reservation.objects.filter(status='overdue').order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return completed
+        completed += sum(1 for outcome in complete_returns(ids) if outcome['outcome'] == COMPLETED)
+
+
+def run(now=None, batch_size=BATCH_SIZE):
+    # Apply every due transition; returns the number of reservations moved per step
+    now = now or timezone.now()
+    counts = {
+        'activated': activate_started(now, batch_size),
+        'overdue': mark_overdue(now, batch_size),
+        'completed': 0,
+    }
+    if getattr(settings, 'RESERVATION_AUTO_COMPLETE', False):
+        counts['completed'] = complete_overdue(batch_size)
+    return counts
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations import lifecycle
+
+
+class Command(BaseCommand):
+    help = 'Move reservations through their lifecycle (confirmed -> active -> overdue/completed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, applying due transitions every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between runs with --loop (default: 60)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=lifecycle.BATCH_SIZE,
+            help=f'Reservations updated per statement (default: {lifecycle.BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--interval and --batch-size must be positive.')
+        while True:
+            counts = lifecycle.run(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Activated {counts['activated']}, marked {counts['overdue']} overdue, "
+                f"completed {counts['completed']} reservations."
+            ))
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_hot_query_indexes'),
+        ('reservations', '0004_reservation_lifecycle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='reservation_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status__in', ['active', 'overdue'])), fields=['start_date', 'end_date'], name='reservation_blocking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='reservation_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationitem',
+            index=models.Index(fields=['item', 'reservation'], name='reservationitem_item_idx'),
+        ),
+    ]
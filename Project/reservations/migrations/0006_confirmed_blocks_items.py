@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0005_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='reservation_blocking_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status__in', ['confirmed', 'active', 'overdue'])), fields=['start_date', 'end_date'], name='reservation_blocking_idx'),
+        ),
+    ]
@@ -12,6 +12,7 @@ class Reservation(models.Model):
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
         ('active', 'Active'),
+        ('overdue', 'Overdue'),
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     )
@@ -20,16 +21,31 @@ class Reservation(models.Model):
     reservation_date = models.DateTimeField(auto_now_add=True)
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active', db_index=True)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
+    # When the lifecycle engine (or a return) moved the reservation into each state
+    activated_at = models.DateTimeField(null=True, blank=True)
+    overdue_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Reservation #{self.id} by {self.user.username}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'start_date', 'end_date'], name='reservation_status_dates_idx'),
+            # Only reservations that block items are ever searched by date
+            models.Index(
+                fields=['start_date', 'end_date'],
+                condition=models.Q(status__in=['confirmed', 'active', 'overdue']),
+                name='reservation_blocking_idx'
+            ),
+            # My Reservations, newest first
+            models.Index(fields=['user', 'created_at', 'id'], name='reservation_user_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.start_date and not timezone.is_aware(self.start_date):
@@ -56,6 +72,10 @@ class ReservationItem(models.Model):
 
     class Meta:
         unique_together = ['reservation', 'item']
+        indexes = [
+            # Reservations holding a given item
+            models.Index(fields=['item', 'reservation'], name='reservationitem_item_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.id:  # New instance
@@ -0,0 +1,165 @@
+import random
+import time
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import reference_cache
+from inventory.models import Item
+from . import availability
+from .models import Reservation, ReservationItem
+
+# Booking service.
+# Bookings serialize per item rather than globally: the Item rows being booked
+# are locked for the duration of the conflict check and the inserts, so
+# bookings for different items proceed in parallel while two bookings for the
+# same item can never both pass the check.
+
+LOCK_RETRIES = 5
+LOCK_BACKOFF = 0.05  # seconds, doubled on every retry
+
+CONFLICT_MESSAGES = {
+    availability.MAINTENANCE: '{name} is scheduled for maintenance during the selected dates.',
+    availability.RESERVED: '{name} is already reserved for the selected dates.',
+}
+
+
+class BookingConflict(Exception):
+    # Raised when some items cannot be booked; `conflicts` describes each one
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__('; '.join(conflict['message'] for conflict in conflicts))
+
+
+def _conflict_error(found, items):
+    names = {item.id: item.name for item in items}
+    return BookingConflict([{
+        'item_id': item_id,
+        'item_name': names[item_id],
+        'reason': reason,
+        'message': CONFLICT_MESSAGES[reason].format(name=names[item_id]),
+    } for item_id, reason in sorted(found.items())])
+
+
+def _lock_items(item_ids):
+    if connection.features.has_select_for_update:
+        # Row locks in a fixed order, so concurrent bookings cannot deadlock
+        list(Item.objects.select_for_update().filter(id__in=item_ids).order_by('id').values_list('id', flat=True))
+    else:
+        # SQLite has no row locks. A no-op write takes the database write lock
+        # up front, like BEGIN IMMEDIATE, so the check below cannot go stale
+        Item.objects.filter(id__in=item_ids).update(updated_at=F('updated_at'))
+
+
+def _is_lock_error(error):
+    return 'locked' in str(error).lower()
+
+
+def _create_booking(user, items, start_date, end_date):
+    item_ids = sorted(item.id for item in items)
+    days = (end_date - start_date).days + 1
+    with transaction.atomic():
+        _lock_items(item_ids)
+        found = availability.find_conflicts_in_db(item_ids, start_date, end_date)
+        if found:
+            raise _conflict_error(found, items)
+
+        subtotals = {item.id: item.daily_rate * Decimal(str(days)) for item in items}
+        # Future bookings start out confirmed; the lifecycle engine activates them
+        now = timezone.now()
+        started = start_date <= now
+        reservation = Reservation.objects.create(
+            user=user,
+            start_date=start_date,
+            end_date=end_date,
+            status='active' if started else 'confirmed',
+            activated_at=now if started else None,
+            total_cost=sum(subtotals.values())
+        )
+        ReservationItem.objects.bulk_create([
+            ReservationItem(
+                reservation=reservation,
+                item=item,
+                price_per_day=item.daily_rate,
+                subtotal=subtotals[item.id]
+            )
+            for item in items
+        ])
+        # bulk_create sends no post_save, so update the index here
+        availability.invalidate_items(item_ids)
+    return reservation
+
+
+def book_items(user, items, start_date, end_date):
+    # Reserve `items` for [start_date, end_date] or raise BookingConflict
+    items = list({item.id: item for item in items}.values())
+
+    # Cheap rejection from the availability index before taking any lock
+    found = availability.find_conflicts([item.id for item in items], start_date, end_date)
+    if found:
+        raise _conflict_error(found, items)
+
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return _create_booking(user, items, start_date, end_date)
+        except OperationalError as error:
+            # Inside an outer transaction the caller owns the retry
+            if not _is_lock_error(error) or connection.in_atomic_block or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+# Statuses a reservation can be returned from
+RETURNABLE_STATUSES = ('pending', 'confirmed', 'active', 'overdue')
+
+COMPLETED = 'completed'
+NOT_FOUND = 'not_found'
+SKIPPED = 'skipped'
+
+
+def _statuses(reservation_ids):
+    return dict(Reservation.objects.filter(id__in=reservation_ids).values_list('id', 'status'))
+
+
+def complete_returns(reservation_ids):
+    # Complete many returns in one transaction with set-based updates.
+    # Returns one {reservation_id, outcome, detail} entry per requested id.
+    reservation_ids = list(dict.fromkeys(reservation_ids))
+    now = timezone.now()
+    with transaction.atomic():
+        statuses = _statuses(reservation_ids)
+        returnable = [rid for rid, status in statuses.items() if status in RETURNABLE_STATUSES]
+        # Re-check the status in the UPDATE so a concurrent return is not applied twice
+        Reservation.objects.filter(id__in=returnable, status__in=RETURNABLE_STATUSES).update(
+            status='completed', completed_at=now, updated_at=now
+        )
+        # Only the rows this call moved count as returned and free their items
+        completed = set(Reservation.objects.filter(
+            id__in=returnable, status='completed', completed_at=now
+        ).values_list('id', flat=True))
+        item_ids = set(ReservationItem.objects.filter(reservation_id__in=completed).values_list('item_id', flat=True))
+        Item.objects.filter(id__in=item_ids).update(is_available=True, updated_at=now)
+        # QuerySet.update sends no signals
+        availability.invalidate_items(item_ids)
+        if item_ids:
+            reference_cache.invalidate(reference_cache.ITEM)
+
+    outcomes = []
+    for reservation_id in reservation_ids:
+        status = statuses.get(reservation_id)
+        if status is None:
+            outcomes.append({'reservation_id': reservation_id, 'outcome': NOT_FOUND,
+                             'detail': 'Reservation not found.'})
+        elif reservation_id in completed:
+            outcomes.append({'reservation_id': reservation_id, 'outcome': COMPLETED,
+                             'detail': 'Return processed.'})
+        elif status in RETURNABLE_STATUSES:
+            outcomes.append({'reservation_id': reservation_id, 'outcome': SKIPPED,
+                             'detail': 'Reservation was changed by another request.'})
+        else:
+            outcomes.append({'reservation_id': reservation_id, 'outcome': SKIPPED,
+                             'detail': f'Reservation is {status}.'})
+    return outcomes
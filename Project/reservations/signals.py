@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inventory.models import Maintenance
+from .availability import invalidate_items
+from .models import Reservation, ReservationItem
+
+# Keep the availability index in step with the rows it is built from.
+# Deleting a Reservation cascades to its ReservationItems, whose own
+# post_delete signals take care of the affected items.
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    invalidate_items(
+        ReservationItem.objects.filter(reservation=instance).values_list('item_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=ReservationItem)
+@receiver(post_delete, sender=ReservationItem)
+def reservation_item_changed(sender, instance, **kwargs):
+    invalidate_items([instance.item_id])
+
+
+@receiver(post_save, sender=Maintenance)
+@receiver(post_delete, sender=Maintenance)
+def maintenance_changed(sender, instance, **kwargs):
+    invalidate_items([instance.item_id])
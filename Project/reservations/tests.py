@@ -1,13 +1,24 @@
-from django.test import TestCase, Client
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from core.models import UserProfile
-from inventory.models import Category, Item
+from core.cache_versions import bump, get_versions
+from inventory.models import Category, Item, Maintenance
+from reservations import availability, lifecycle, services
 from reservations.models import Reservation, ReservationItem
 from decimal import Decimal
 
+from core.views import parse_booking_dates
+
 User = get_user_model()
 
 class ReservationTests(TestCase):
@@ -121,4 +132,363 @@ class ReservationTests(TestCase):
         # Test viewing reservations
         response = self.client.get(reverse('my_reservations'))
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'core/my_reservations.html') 
\ No newline at end of file
+        self.assertTemplateUsed(response, 'core/my_reservations.html')
+
+    def make_reservations(self, count, status):
+        for _ in range(count):
+            reservation = Reservation.objects.create(
+                user=self.user,
+                start_date=timezone.now() + timedelta(days=1),
+                end_date=timezone.now() + timedelta(days=2),
+                status=status,
+                total_cost=Decimal('100.00')
+            )
+            ReservationItem.objects.create(
+                reservation=reservation,
+                item=self.item,
+                price_per_day=self.item.daily_rate,
+                subtotal=Decimal('100.00')
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_reservations_query_count_is_constant(self):
+        self.make_reservations(1, 'active')
+        self.make_reservations(1, 'cancelled')
+        # The first request of a session stores the role in it
+        self.count_queries(reverse('my_reservations'))
+        baseline = self.count_queries(reverse('my_reservations'))
+        self.make_reservations(8, 'active')
+        self.make_reservations(5, 'cancelled')
+        self.assertEqual(self.count_queries(reverse('my_reservations')), baseline)
+
+    def test_reservations_are_split_and_paginated(self):
+        self.make_reservations(12, 'active')
+        self.make_reservations(3, 'cancelled')
+        response = self.client.get(reverse('my_reservations'), {'active_page': 2})
+        self.assertEqual(len(response.context['active_page']), 2)
+        self.assertEqual(len(response.context['cancelled_page']), 3)
+        self.assertEqual(response.context['summary']['total_spent'], Decimal('1200.00'))
+
+        data = self.client.get(reverse('my_reservations'), {'format': 'json'}).json()
+        self.assertEqual(data['summary']['active_count'], 12)
+        self.assertEqual(data['active']['num_pages'], 2)
+        self.assertEqual(len(data['active']['results']), 10)
+        self.assertEqual(data['cancelled']['results'][0]['items'][0]['name'], 'Test Item') 
+
+class AvailabilityIndexTests(TransactionTestCase):
+    # TransactionTestCase so the index caches committed rows like it does in production
+    def setUp(self):
+        cache.clear()
+        availability.index.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(availability.index.clear)
+        self.user = User.objects.create_user(
+            username='indexuser',
+            email='index@example.com',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name='Index Category')
+        self.item = Item.objects.create(
+            name='Index Item',
+            description='Test Description',
+            category=self.category,
+            daily_rate=Decimal('10.00'),
+            condition='excellent'
+        )
+        self.start = timezone.now() + timedelta(days=2)
+        self.end = timezone.now() + timedelta(days=4)
+
+    def reserve(self, status='active'):
+        reservation = Reservation.objects.create(
+            user=self.user,
+            start_date=self.start,
+            end_date=self.end,
+            status=status,
+            total_cost=Decimal('30.00')
+        )
+        ReservationItem.objects.create(
+            reservation=reservation,
+            item=self.item,
+            price_per_day=self.item.daily_rate,
+            subtotal=Decimal('30.00')
+        )
+        return reservation
+
+    def test_intervals_overlap(self):
+        intervals = availability.Intervals([(1, 3), (10, 20), (5, 6)])
+        self.assertTrue(intervals.overlaps(2, 2))
+        self.assertTrue(intervals.overlaps(6, 9))
+        self.assertTrue(intervals.overlaps(15, 30))
+        self.assertFalse(intervals.overlaps(4, 4))
+        self.assertFalse(intervals.overlaps(7, 9))
+        self.assertFalse(intervals.overlaps(21, 30))
+
+    def test_index_is_cached_and_invalidated_by_signals(self):
+        self.assertIsNone(availability.find_conflict(self.item.id, self.start, self.end))
+        with self.assertNumQueries(0):
+            self.assertIsNone(availability.find_conflict(self.item.id, self.start, self.end))
+
+        reservation = self.reserve()
+        self.assertEqual(
+            availability.find_conflict(self.item.id, self.start, self.end),
+            availability.RESERVED
+        )
+
+        reservation.status = 'cancelled'
+        reservation.save()
+        self.assertIsNone(availability.find_conflict(self.item.id, self.start, self.end))
+
+        Maintenance.objects.create(
+            item=self.item,
+            staff=self.user,
+            maintenance_date=self.start + timedelta(days=1),
+            description='Service'
+        )
+        self.assertEqual(
+            availability.find_conflict(self.item.id, self.start, self.end),
+            availability.MAINTENANCE
+        )
+
+    def test_version_bump_from_another_process_invalidates(self):
+        self.assertIsNone(availability.find_conflict(self.item.id, self.start, self.end))
+        # Simulate a write from another worker: rows change and only the cache version moves
+        with mock.patch.object(availability, 'invalidate_items'):
+            self.reserve()
+        bump([availability.version_key(self.item.id)])
+        self.assertEqual(
+            availability.find_conflict(self.item.id, self.start, self.end),
+            availability.RESERVED
+        )
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_falls_back_to_database_without_cache(self):
+        self.reserve()
+        with self.assertNoLogs('reservations.availability', level='WARNING'):
+            conflict = availability.find_conflict(self.item.id, self.start, self.end)
+        self.assertEqual(conflict, availability.RESERVED)
+
+    def test_cache_errors_are_logged(self):
+        self.reserve()
+        with mock.patch.object(availability, 'get_versions', side_effect=ConnectionError('cache down')):
+            with self.assertLogs('reservations.availability', level='WARNING') as logs:
+                conflict = availability.find_conflict(self.item.id, self.start, self.end)
+        self.assertEqual(conflict, availability.RESERVED)
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_not_trusted(self):
+        # Another worker's bump would never reach this process's LocMemCache
+        self.assertEqual(get_versions([availability.version_key(self.item.id)]), {})
+        with self.assertLogs('reservations.availability', level='DEBUG'):
+            self.assertIsNone(availability.find_conflict(self.item.id, self.start, self.end))
+        with mock.patch.object(availability, 'invalidate_items'):
+            self.reserve()
+        with self.assertNoLogs('reservations.availability', level='WARNING'):
+            conflict = availability.find_conflict(self.item.id, self.start, self.end)
+        self.assertEqual(conflict, availability.RESERVED)
+
+    def test_calendar_is_cached_until_item_changes(self):
+        today = timezone.localdate()
+        self.assertEqual(availability.availability_calendar([self.item.id], today, 7)[self.item.id], '1' * 7)
+        with self.assertNumQueries(0):
+            availability.availability_calendar([self.item.id], today, 7)
+
+        self.reserve()
+        self.assertEqual(availability.availability_calendar([self.item.id], today, 7)[self.item.id], '1100011')
+
+
+class BookingServiceTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        availability.index.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(availability.index.clear)
+        self.user = User.objects.create_user(
+            username='booker',
+            email='booker@example.com',
+            password='testpass'
+        )
+        category = Category.objects.create(name='Booking Category')
+        self.items = [
+            Item.objects.create(
+                name=f'Kayak {i}',
+                description='Test Description',
+                category=category,
+                daily_rate=Decimal('25.00'),
+                condition='excellent'
+            )
+            for i in range(4)
+        ]
+        self.start = timezone.now() + timedelta(days=1)
+        self.end = timezone.now() + timedelta(days=3)
+
+    def test_structured_conflicts(self):
+        services.book_items(self.user, [self.items[0]], self.start, self.end)
+        with self.assertRaises(services.BookingConflict) as raised:
+            services.book_items(self.user, self.items[:2], self.start, self.end)
+        self.assertEqual(raised.exception.conflicts, [{
+            'item_id': self.items[0].id,
+            'item_name': 'Kayak 0',
+            'reason': availability.RESERVED,
+            'message': 'Kayak 0 is already reserved for the selected dates.',
+        }])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_concurrent_bookings_for_one_item_never_double_book(self):
+        outcomes = []
+
+        def book(item):
+            try:
+                services.book_items(self.user, [item], self.start, self.end)
+                outcomes.append((item.id, 'booked'))
+            except services.BookingConflict:
+                outcomes.append((item.id, 'conflict'))
+            finally:
+                connection.close()
+
+        check = availability.find_conflicts_in_db
+
+        def slow_check(*args):
+            # Widen the window between the check and the insert
+            found = check(*args)
+            time.sleep(0.05)
+            return found
+
+        # Stale index so every thread gets past the pre-check to the locked section
+        with mock.patch.object(availability, 'find_conflicts', return_value={}), \
+                mock.patch.object(availability, 'find_conflicts_in_db', slow_check), \
+                mock.patch.object(services, 'LOCK_RETRIES', 50):
+            threads = [threading.Thread(target=book, args=(self.items[i % 2],)) for i in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(outcome for _, outcome in outcomes), ['booked'] * 2 + ['conflict'] * 4)
+        for item in self.items[:2]:
+            self.assertEqual(ReservationItem.objects.filter(item=item).count(), 1)
+
+    def test_database_check_is_one_query_for_many_items(self):
+        services.book_items(self.user, self.items[:2], self.start, self.end)
+        with self.assertNumQueries(1):
+            found = availability.find_conflicts_in_db([item.id for item in self.items], self.start, self.end)
+        self.assertEqual(found, {self.items[0].id: availability.RESERVED, self.items[1].id: availability.RESERVED})
+
+
+class LifecycleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='renter',
+            email='renter@example.com',
+            password='testpass'
+        )
+        category = Category.objects.create(name='Lifecycle Category')
+        self.item = Item.objects.create(
+            name='Canoe',
+            description='Test Description',
+            category=category,
+            daily_rate=Decimal('30.00'),
+            condition='excellent',
+            is_available=False
+        )
+        now = timezone.now()
+        self.started = self.reservation('confirmed', now - timedelta(days=1), now + timedelta(days=1))
+        self.future = self.reservation('confirmed', now + timedelta(days=1), now + timedelta(days=2))
+        self.ended = self.reservation('active', now - timedelta(days=4), now - timedelta(days=1, hours=1))
+
+    def reservation(self, status, start, end):
+        reservation = Reservation.objects.create(
+            user=self.user, start_date=start, end_date=end, status=status, total_cost=Decimal('60.00')
+        )
+        ReservationItem.objects.create(
+            reservation=reservation, item=self.item,
+            price_per_day=self.item.daily_rate, subtotal=Decimal('60.00')
+        )
+        return reservation
+
+    def test_run_applies_due_transitions_in_batches(self):
+        counts = lifecycle.run(batch_size=1)
+        self.assertEqual(counts, {'activated': 1, 'overdue': 1, 'completed': 0})
+        for reservation in (self.started, self.future, self.ended):
+            reservation.refresh_from_db()
+        self.assertEqual(self.started.status, 'active')
+        self.assertIsNotNone(self.started.activated_at)
+        self.assertEqual(self.future.status, 'confirmed')
+        self.assertEqual(self.ended.status, 'overdue')
+        self.assertIsNotNone(self.ended.overdue_at)
+        # Nothing left to do on a second run
+        self.assertEqual(lifecycle.run(), {'activated': 0, 'overdue': 0, 'completed': 0})
+
+    @override_settings(RESERVATION_AUTO_COMPLETE=True)
+    def test_auto_complete_frees_items(self):
+        lifecycle.run()
+        self.ended.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual(self.ended.status, 'completed')
+        self.assertIsNotNone(self.ended.completed_at)
+        self.assertTrue(self.item.is_available)
+
+    def test_overdue_reservations_still_block_the_item(self):
+        lifecycle.run()
+        conflicts = availability.find_conflicts_in_db(
+            [self.item.id], self.ended.end_date - timedelta(hours=2), self.ended.end_date
+        )
+        self.assertEqual(conflicts, {self.item.id: availability.RESERVED})
+
+
+class LifecycleBookingTests(TestCase):
+    # Reservations made the way customers make them, with whole-day dates
+    def setUp(self):
+        self.user = User.objects.create_user(username='camper', email='camper@example.com', password='testpass')
+        category = Category.objects.create(name='Camping')
+        self.tent = Item.objects.create(name='Tent', description='Two person', category=category,
+                                        daily_rate=Decimal('15.00'), condition='excellent')
+        self.first_day = timezone.localdate() + timedelta(days=3)
+        self.last_day = self.first_day + timedelta(days=3)
+        self.reservation = self.book(self.first_day, self.last_day)
+
+    def book(self, first_day, last_day):
+        start, end = parse_booking_dates(first_day.isoformat(), last_day.isoformat())
+        return services.book_items(self.user, [self.tent], start, end)
+
+    def at(self, day, hours):
+        return timezone.make_aware(datetime(day.year, day.month, day.day)) + timedelta(hours=hours)
+
+    def test_future_booking_is_confirmed_until_it_starts(self):
+        self.assertEqual(self.reservation.status, 'confirmed')
+        self.assertIsNone(self.reservation.activated_at)
+        # A confirmed booking holds the item like an active one
+        with self.assertRaises(services.BookingConflict):
+            self.book(self.last_day, self.last_day)
+        self.assertFalse(Item.objects.filter(
+            availability.free_during(*parse_booking_dates(self.first_day.isoformat(), self.first_day.isoformat()))
+        ).exists())
+
+        lifecycle.run(now=self.at(self.first_day, 9))
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.status, 'active')
+        self.assertIsNotNone(self.reservation.activated_at)
+
+    def test_last_paid_day_is_not_overdue(self):
+        self.assertEqual(self.reservation.total_cost, Decimal('60.00'))
+        lifecycle.run(now=self.at(self.first_day, 9))
+        lifecycle.run(now=self.at(self.last_day, 23))
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.status, 'active')
+
+        lifecycle.run(now=self.at(self.last_day + timedelta(days=1), 1))
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.status, 'overdue')
+
+    @override_settings(RESERVATION_AUTO_COMPLETE=True)
+    def test_auto_complete_does_not_free_the_item_during_its_last_day(self):
+        lifecycle.run(now=self.at(self.first_day, 9))
+        lifecycle.run(now=self.at(self.last_day, 1))
+        with self.assertRaises(services.BookingConflict):
+            self.book(self.last_day, self.last_day)
+        next_day = self.last_day + timedelta(days=1)
+        self.assertIsNotNone(self.book(next_day, next_day).pk)
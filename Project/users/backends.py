@@ -1,9 +1,110 @@
+import threading
+import time
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.db import DEFAULT_DB_ALIAS, transaction
 from django.db.models import Q
 
 User = get_user_model()
 
+class UserCache:
+    # Short-lived per-process cache of the user and profile rows behind get_user().
+    # Only raw field values are kept and fresh instances are built for every
+    # request, so nothing a view sets on request.user leaks into the next one.
+    # Entries are dropped by the User/UserProfile signals (users.signals), and
+    # the TTL bounds how long another process's change can go unnoticed.
+    # Authorization does not rely on it: core.roles reads the role from the
+    # database whenever its shared role version changes.
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def ttl(self):
+        return getattr(settings, 'USER_CACHE_TTL', 0)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, rows):
+        with self._lock:
+            if len(self._entries) >= getattr(settings, 'USER_CACHE_MAX_USERS', 10000):
+                self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + self.ttl(), rows)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def _field_names(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _profile_relation():
+    # The reverse side of UserProfile.user
+    return User._meta.get_field('userprofile')
+
+
+def _rows(user):
+    # Raw values of the user and of its profile (None when there is none)
+    profile = getattr(user, 'userprofile', None)
+    profile_values = None
+    if profile is not None:
+        profile_values = [getattr(profile, name) for name in _field_names(profile.__class__)]
+    return [getattr(user, name) for name in _field_names(User)], profile_values
+
+
+def _build(rows):
+    user_values, profile_values = rows
+    user = User.from_db(DEFAULT_DB_ALIAS, _field_names(User), user_values)
+    relation = _profile_relation()
+    profile = None
+    if profile_values is not None:
+        profile_model = relation.related_model
+        profile = profile_model.from_db(DEFAULT_DB_ALIAS, _field_names(profile_model), profile_values)
+        relation.remote_field.set_cached_value(profile, user)
+    # Cached either way, so a missing profile does not cost a query either
+    relation.set_cached_value(user, profile)
+    return user
+
+
+def load_user(user_id):
+    # The user with its profile in one query, served from the cache when enabled
+    caching = user_cache.ttl() > 0
+    if caching:
+        rows = user_cache.get(user_id)
+        if rows is not None:
+            return _build(rows)
+    try:
+        user = User.objects.select_related('userprofile').get(pk=user_id)
+    except User.DoesNotExist:
+        return None
+    # Rows read inside a transaction may still be rolled back
+    if caching and not transaction.get_connection().in_atomic_block:
+        user_cache.set(user_id, _rows(user))
+    return user
+
+
+def invalidate_user(user_id):
+    # Drop the cached rows now and again once the change is committed
+    user_cache.discard(user_id)
+    transaction.on_commit(lambda: user_cache.discard(user_id))
+
+
 class EmailOrUsernameModelBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         try:
@@ -17,10 +118,7 @@ class EmailOrUsernameModelBackend(ModelBackend):
             return None
         
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        return load_user(user_id)
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
@@ -33,7 +131,4 @@ class EmailBackend(ModelBackend):
         return None
     
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None 
\ No newline at end of file
+        return load_user(user_id)
@@ -1,7 +1,8 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from core.models import UserProfile
+from users.backends import EmailBackend, user_cache
 
 User = get_user_model()
 
@@ -87,4 +88,32 @@ class UserAuthenticationTest(TestCase):
         self.client.logout()
         response = self.client.get(reverse('manage_inventory'))
         self.assertEqual(response.status_code, 302)
-        self.assertTrue(response.url.startswith('/login/')) 
\ No newline at end of file
+        self.assertTrue(response.url.startswith('/login/')) 
+
+@override_settings(USER_CACHE_TTL=60)
+class UserCacheTest(TransactionTestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='password')
+        self.backend = EmailBackend()
+
+    def test_user_and_profile_load_in_one_query_then_from_cache(self):
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.user.pk)
+            self.assertEqual(user.userprofile.role, 'customer')
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.pk)
+            self.assertEqual(user.userprofile.role, 'customer')
+            self.assertEqual(user.userprofile.user, user)
+
+    def test_role_change_invalidates_cache(self):
+        self.backend.get_user(self.user.pk)
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'manager'
+        profile.save()
+        self.assertEqual(self.backend.get_user(self.user.pk).userprofile.role, 'manager')
+
+    def test_cached_instances_are_not_shared(self):
+        self.backend.get_user(self.user.pk).first_name = 'Changed'
+        self.assertEqual(self.backend.get_user(self.user.pk).first_name, '')
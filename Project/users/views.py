@@ -6,6 +6,7 @@ from django.template.context_processors import csrf
 from django.middleware.csrf import get_token
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from core.roles import remember_role
 
 User = get_user_model()
 
@@ -37,7 +38,7 @@ def login_view(request):
                 role = 'admin' if user.is_superuser else 'staff' if user.is_staff else 'customer'
                 UserProfile.objects.create(user=user, role=role)
             # Set user's role in session
-            request.session['user_role'] = user.userprofile.role
+            remember_role(request, user.userprofile.role)
             # Handle next parameter
             next_url = request.GET.get('next')
             if next_url: